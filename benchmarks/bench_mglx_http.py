@@ -0,0 +1,153 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+'''
+bandwidth and CPU cost of GW2 API responses, measured offline with the fixture replay
+
+usage: python benchmarks/bench_mglx_http.py [--fixture recorded.json.gz] [--repeat 20]
+
+Without --fixture a synthetic fixture with account, achievements and account achievements
+responses of realistic size is generated. A real one is written by MglxHttpRecorder.
+'''
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.mglx_http import HTTP_ACCEPT_ENCODING
+from common.mglx_http_replay import MglxHttpRecorder, MglxHttpReplay
+from common.mglx_json import MglxJsonCodec, get_default_codec
+
+API_DOMAIN = 'https://api.guildwars2.com'
+
+
+def create_fixture(path: str) -> None:
+    rnd = random.Random(0)
+
+    account = {'id': 'ABCDEF01-2345-6789-ABCD-EF0123456789', 'name': 'Player.1234', 'age': 12345678, 'world': 2003,
+               'guilds': [], 'created': '2015-01-01T00:00:00Z', 'access': ['GuildWars2', 'HeartOfThorns', 'PathOfFire']}
+
+    account_achievements = list()
+    for achievement_id in range(1, 4001):
+        entry = {'id': achievement_id, 'current': rnd.randint(0, 50), 'max': 50, 'done': rnd.random() < 0.4}
+        if rnd.random() < 0.3:
+            entry['bits'] = sorted(rnd.sample(range(64), rnd.randint(1, 16)))
+        account_achievements.append(entry)
+
+    achievements = [{'id': i, 'name': 'Achievement %s' % i, 'description': 'Complete the objective number %s.' % i,
+                     'requirement': 'Complete %s events' % rnd.randint(1, 50), 'type': 'Default', 'flags': ['Pvp'],
+                     'tiers': [{'count': 10, 'points': 5}]} for i in range(1, 201)]
+
+    entries = [
+        ('/v2/account', None, account),
+        ('/v2/account/achievements', None, account_achievements),
+        ('/v2/achievements', {'ids': ','.join(str(i) for i in range(1, 201))}, achievements),
+    ]
+
+    recorder = MglxHttpRecorder(path)
+    for url, params, body in entries:
+        recorder.record('GET', API_DOMAIN + url, params, 200, {'Content-Type': 'application/json; charset=utf-8'}, json.dumps(body), 0.1)
+    recorder.save()
+
+
+def load_entries(path: str):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return [entry for entry in lines[1:] if entry['body']]
+
+
+def measure(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def bench_bandwidth(entries) -> None:
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    print('bandwidth, bytes per replayed session (Accept-Encoding: %s)' % HTTP_ACCEPT_ENCODING)
+    bodies = [entry['body'].encode('utf-8') for entry in entries]
+    print('  %-10s %10d' % ('identity', sum(len(body) for body in bodies)))
+    print('  %-10s %10d' % ('gzip', sum(len(gzip.compress(body, 6)) for body in bodies)))
+    print('  %-10s %10d' % ('deflate', sum(len(zlib.compress(body, 6)) for body in bodies)))
+    if brotli is not None:
+        print('  %-10s %10d' % ('br', sum(len(brotli.compress(body, quality=4)) for body in bodies)))
+    else:
+        print('  %-10s %10s' % ('br', 'n/a, brotli is not installed'))
+
+
+def bench_decode(entries, repeat: int) -> None:
+    print('decode CPU, ms per replayed session')
+
+    bodies = [entry['body'].encode('utf-8') for entry in entries]
+    text_path = lambda: [json.loads(body.decode('utf-8')) for body in bodies]
+    print('  %-24s %8.3f' % ('text + json.loads', measure(text_path, repeat) * 1000))
+
+    codecs = [MglxJsonCodec('json', json.loads)]
+    if get_default_codec().name != 'json':
+        codecs.append(get_default_codec())
+
+    for codec in codecs:
+        bytes_path = lambda: [codec.loads(body) for body in bodies]
+        print('  %-24s %8.3f' % ('bytes + %s' % codec.name, measure(bytes_path, repeat) * 1000))
+
+
+def bench_replay(path: str, entries, repeat: int) -> None:
+    print('replay round trip, ms per replayed session')
+
+    async def session():
+        replay = MglxHttpReplay(path)
+
+        async def text_path():
+            for entry in entries:
+                response = await replay.request('GET', entry['url'], params=entry['params'])
+                json.loads(response.text)
+
+        async def json_path():
+            for entry in entries:
+                await replay.request_json('GET', entry['url'], params=entry['params'])
+
+        for name, func in (('request + json.loads', text_path), ('request_json', json_path)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                await func()
+            print('  %-24s %8.3f' % (name, (time.perf_counter() - started) / repeat * 1000))
+
+    asyncio.run(session())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fixture', help='fixture written by MglxHttpRecorder')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.fixture
+        if path is None:
+            path = os.path.join(tmp, 'fixture.json.gz')
+            create_fixture(path)
+
+        entries = load_entries(path)
+        print('fixture: %s, %d responses' % (args.fixture or 'synthetic', len(entries)))
+        bench_bandwidth(entries)
+        bench_decode(entries, args.repeat)
+        bench_replay(path, entries, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+'''
+cost of log calls on hot paths with the plugin logging setup
+
+usage: python benchmarks/bench_mglx_logging.py [--number 20000]
+
+Compares eager and lazy formatting of debug calls (buffered or disabled), warnings repeated in a
+loop with and without the rate limiter, and truncation of large response bodies.
+'''
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.mglx_logging import MglxRateLimitFilter, MglxTruncated, install
+
+BODY = json.dumps([{'id': i, 'current': i % 50, 'max': 50, 'done': i % 3 == 0} for i in range(4000)])
+
+
+def create_logger(name: str, buffer_level: int, rate_limit: bool) -> logging.Logger:
+    install([name], buffer_level=buffer_level, rate_limit=MglxRateLimitFilter() if rate_limit else MglxRateLimitFilter(burst=sys.maxsize))
+    return logging.getLogger(name)
+
+
+def report(name: str, func, number: int) -> None:
+    seconds = timeit.timeit(func, number=number)
+    print('  %-44s %8.3f us/call' % (name, seconds / number * 1e6))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    #root handler writes to nowhere, only the cost of the logging machinery is measured
+    root_handler = logging.StreamHandler(open(os.devnull, 'w'))
+    root_handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(levelname)s %(message)s'))
+    logging.getLogger().addHandler(root_handler)
+    logging.getLogger().setLevel(logging.DEBUG)
+
+    buffered = create_logger('bench_buffered', logging.DEBUG, True)
+    disabled = create_logger('bench_disabled', logging.INFO, True)
+    unlimited = create_logger('bench_unlimited', logging.INFO, False)
+    limited = create_logger('bench_limited', logging.INFO, True)
+
+    url, status = '/v2/account/achievements', 200
+
+    print('debug call, ring buffer enabled')
+    report('eager %', lambda: buffered.debug('request: %s --> %s' % (url, status)), args.number)
+    report('lazy args', lambda: buffered.debug('request: %s --> %s', url, status), args.number)
+
+    print('debug call, level disabled')
+    report('eager %', lambda: disabled.debug('request: %s --> %s' % (url, status)), args.number)
+    report('lazy args', lambda: disabled.debug('request: %s --> %s', url, status), args.number)
+
+    print('response body in a debug call, ring buffer enabled')
+    report('eager slice of str', lambda: buffered.debug('response: %s' % BODY[:256]), args.number)
+    report('MglxTruncated', lambda: buffered.debug('response: %s', MglxTruncated(BODY)), args.number)
+
+    print('repeated warning')
+    report('without rate limit', lambda: unlimited.warning('request: %s --> %s', url, status), args.number)
+    report('with rate limit', lambda: limited.warning('request: %s --> %s', url, status), args.number)
+
+    #eager formatting makes every message unique, so the rate limiter can not group them
+    counter = itertools.count()
+    report('with rate limit, eager % of changing value', lambda: limited.warning('stall: %s ms' % next(counter)), args.number)
+    report('with rate limit, lazy changing value', lambda: limited.warning('stall: %s ms', next(counter)), args.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,35 @@
 # (c) 2019-2020 Mikhail Paulyshka
 # SPDX-License-Identifier: MIT
 
+from .mglx_cache import MglxCacheManager
+from .mglx_executor import MglxExecutor
 from .mglx_http import MglxHttp
+from .mglx_http_replay import MglxHttpRecorder, MglxHttpReplay
+from .mglx_http_trace import MglxHttpTracer
+from .mglx_json import MglxJsonCodec
+from .mglx_lifecycle import MglxLifecycle
+from .mglx_logging import MglxRateLimitFilter, MglxRingBufferHandler, MglxTruncated
+from .mglx_sentry import MglxSentryFilter, MglxSentryTransport
+from .mglx_watchdog import MglxLoopWatchdog
+from .mglx_watcher import MglxWatcher, MglxWatcherBackend
 from .mglx_webserver import MglxWebserver
 
 __all__ = (
-    'MglxHttp'
-    'MglxWebserver'
+    'MglxCacheManager',
+    'MglxExecutor',
+    'MglxHttp',
+    'MglxHttpRecorder',
+    'MglxHttpReplay',
+    'MglxHttpTracer',
+    'MglxJsonCodec',
+    'MglxLifecycle',
+    'MglxRateLimitFilter',
+    'MglxRingBufferHandler',
+    'MglxSentryFilter',
+    'MglxSentryTransport',
+    'MglxTruncated',
+    'MglxLoopWatchdog',
+    'MglxWatcher',
+    'MglxWatcherBackend',
+    'MglxWebserver',
 )
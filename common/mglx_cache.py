@@ -0,0 +1,99 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict
+
+class MglxCacheManager:
+    '''
+    write-behind wrapper around Galaxy persistent cache
+
+    Changes are tracked and pushed only when the cache is dirty. Pushes are coalesced:
+    every write restarts the debounce window, but a dirty cache is never kept unpushed
+    for longer than max_staleness seconds.
+    '''
+
+    CACHE_DEFAULT_DEBOUNCE = 10
+    CACHE_DEFAULT_MAX_STALENESS = 300
+
+    def __init__(self, cache_getter: Callable[[], Dict], push_func: Callable[[], None], debounce: float = CACHE_DEFAULT_DEBOUNCE, max_staleness: float = CACHE_DEFAULT_MAX_STALENESS):
+        self.__logger = logging.getLogger('mglx_cache')
+
+        self.__cache_getter = cache_getter
+        self.__push_func = push_func
+        self.__debounce = debounce
+        self.__max_staleness = max(debounce, max_staleness)
+
+        self.__dirty_since = None
+        self.__handle = None
+        self.__push_count = 0
+
+    #
+    # Mapping
+    #
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__cache_getter()
+
+    def __getitem__(self, key: str) -> Any:
+        return self.__cache_getter()[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.__cache_getter().get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        cache = self.__cache_getter()
+        if key in cache and cache[key] == value:
+            return
+
+        cache[key] = value
+        self.mark_dirty()
+
+    #
+    # Info
+    #
+
+    def is_dirty(self) -> bool:
+        return self.__dirty_since is not None
+
+    def get_push_count(self) -> int:
+        return self.__push_count
+
+    #
+    # Flush
+    #
+
+    def mark_dirty(self) -> None:
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+
+        if self.__dirty_since is None:
+            self.__dirty_since = now
+
+        deadline = min(now + self.__debounce, self.__dirty_since + self.__max_staleness)
+
+        if self.__handle is not None:
+            self.__handle.cancel()
+        self.__handle = loop.call_later(max(0, deadline - now), self.flush)
+
+    def flush(self) -> None:
+        if self.__handle is not None:
+            self.__handle.cancel()
+            self.__handle = None
+
+        if self.__dirty_since is None:
+            return
+
+        self.__dirty_since = None
+        try:
+            self.__push_func()
+            self.__push_count += 1
+        except Exception:
+            self.__logger.exception('flush: failed to push cache')
+
+    async def shutdown(self) -> None:
+        self.flush()
@@ -0,0 +1,128 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import concurrent.futures
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable
+
+class MglxExecutor:
+    '''
+    bounded thread pool for blocking filesystem and process operations
+
+    At most max_workers jobs run at once and at most max_queue jobs wait for a worker,
+    further callers wait on the event loop until there is free space in the queue.
+    Jobs submitted with the same key while the previous one is still in flight share its result.
+    '''
+
+    EXECUTOR_DEFAULT_MAX_WORKERS = 4
+    EXECUTOR_DEFAULT_MAX_QUEUE = 16
+
+    def __init__(self, max_workers: int = EXECUTOR_DEFAULT_MAX_WORKERS, max_queue: int = EXECUTOR_DEFAULT_MAX_QUEUE):
+        self.__logger = logging.getLogger('mglx_executor')
+
+        self.__max_workers = max_workers
+        self.__max_queue = max_queue
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = 'mglx_executor')
+        self.__semaphore = None
+
+        self.__pending = dict()
+
+        self.__lock = threading.Lock()
+        self.__waiting = 0
+        self.__queued = 0
+        self.__queued_max = 0
+        self.__running = 0
+        self.__deduplicated = 0
+        self.__jobs = dict()
+
+    async def shutdown(self) -> None:
+        '''
+        does not wait for running jobs, jobs which have not started yet are cancelled
+        '''
+        if sys.version_info >= (3, 9):
+            self.__executor.shutdown(wait = False, cancel_futures = True)
+        else:
+            self.__executor.shutdown(wait = False)
+
+    #
+    # Jobs
+    #
+
+    async def run(self, name: str, func: Callable, *args, key: Hashable = None) -> Any:
+        '''
+        runs func(*args) in the thread pool
+
+        name is used for statistics, key enables deduplication of identical concurrent jobs
+        '''
+        if key is not None and key in self.__pending:
+            self.__deduplicated += 1
+            return await asyncio.shield(self.__pending[key])
+
+        task = asyncio.get_event_loop().create_task(self.__submit(name, func, args))
+        if key is not None:
+            self.__pending[key] = task
+            task.add_done_callback(lambda _: self.__pending.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    async def __submit(self, name: str, func: Callable, args) -> Any:
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__max_workers + self.__max_queue)
+
+        self.__waiting += 1
+        try:
+            await self.__semaphore.acquire()
+        finally:
+            self.__waiting -= 1
+
+        try:
+            with self.__lock:
+                self.__queued += 1
+                self.__queued_max = max(self.__queued_max, self.__queued)
+
+            return await asyncio.get_event_loop().run_in_executor(self.__executor, self.__job, name, func, args, time.monotonic())
+        finally:
+            self.__semaphore.release()
+
+    def __job(self, name: str, func: Callable, args, submitted: float) -> Any:
+        started = time.monotonic()
+        with self.__lock:
+            self.__queued -= 1
+            self.__running += 1
+
+        failed = False
+        try:
+            return func(*args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            finished = time.monotonic()
+            with self.__lock:
+                self.__running -= 1
+
+                stats = self.__jobs.setdefault(name, {'count': 0, 'errors': 0, 'wait_max': 0.0, 'time_total': 0.0, 'time_max': 0.0})
+                stats['count'] += 1
+                stats['errors'] += 1 if failed else 0
+                stats['wait_max'] = max(stats['wait_max'], started - submitted)
+                stats['time_total'] += finished - started
+                stats['time_max'] = max(stats['time_max'], finished - started)
+
+    #
+    # Info
+    #
+
+    def get_stats(self) -> Dict:
+        with self.__lock:
+            return {
+                'waiting': self.__waiting,
+                'queued': self.__queued,
+                'queued_max': self.__queued_max,
+                'running': self.__running,
+                'deduplicated': self.__deduplicated,
+                'jobs': {name: dict(stats) for name, stats in self.__jobs.items()},
+            }
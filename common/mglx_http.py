@@ -5,17 +5,55 @@ import asyncio
 import collections
 import logging
 import ssl
-from typing import Any, Dict
+import time
+from typing import Any, Callable, Dict
 
 import aiohttp
 import certifi
+from multidict import CIMultiDict
+
+from .mglx_json import get_default_codec
+
+def _get_accept_encoding() -> str:
+    '''
+    advertises brotli only if aiohttp itself is able to decode it
+    '''
+    try:
+        #aiohttp 3.9+ supports both brotli and brotlipy
+        from aiohttp.compression_utils import HAS_BROTLI
+        return 'gzip, deflate, br' if HAS_BROTLI else 'gzip, deflate'
+    except ImportError:
+        pass
+
+    try:
+        from aiohttp.http_parser import HAS_BROTLI
+    except ImportError:
+        return 'gzip, deflate'
+
+    if not HAS_BROTLI:
+        return 'gzip, deflate'
+
+    #older aiohttp calls Decompressor.decompress()/flush() which exist only in brotlipy
+    from aiohttp.http_parser import brotli
+    if not hasattr(brotli.Decompressor, 'decompress') or not hasattr(brotli.Decompressor, 'flush'):
+        return 'gzip, deflate'
+
+    return 'gzip, deflate, br'
+
+HTTP_ACCEPT_ENCODING = _get_accept_encoding()
+
+MglxHttpResponse = collections.namedtuple('MglxHttpResponse', ['status', 'text', 'headers'])
+MglxHttpJsonResponse = collections.namedtuple('MglxHttpJsonResponse', ['status', 'json', 'body', 'headers'])
 
 class MglxHttp:
     HTTP_DEFAULT_USER_AGENT = 'mglx_http/1.0.0'
     
-    def __init__(self, user_agent = HTTP_DEFAULT_USER_AGENT, verify_ssl = True):
+    def __init__(self, user_agent = HTTP_DEFAULT_USER_AGENT, verify_ssl = True, recorder = None, tracer = None, json_codec = None):
         self.__user_agent = user_agent
         self.__logger = logging.getLogger('mglx_http')
+        self.__recorder = recorder
+        self.__tracer = tracer
+        self.__json_codec = json_codec if json_codec is not None else get_default_codec()
 
         if verify_ssl:
             self.__sslcontext = ssl.create_default_context(cafile=certifi.where())
@@ -24,12 +62,19 @@ class MglxHttp:
             self.__connector = aiohttp.TCPConnector(verify_ssl=False)
 
         self.__session_headers = {'User-Agent': self.__user_agent}
-        self.__session = aiohttp.ClientSession(connector=self.__connector, headers = self.__session_headers)
+        trace_configs = None
+        if self.__tracer is not None:
+            trace_configs = [self.__tracer.create_trace_config()]
+
+        self.__session = aiohttp.ClientSession(connector=self.__connector, headers = self.__session_headers, trace_configs = trace_configs)
 
 
     async def shutdown(self):
         await self.__session.close()
 
+        if self.__recorder is not None:
+            self.__recorder.save()
+
     def update_headers(self, headers: Dict):
         '''
         update HTTP headers
@@ -37,49 +82,105 @@ class MglxHttp:
         self.__session_headers.update(headers)
 
 
-    async def request(self, method: str, url: str, *, params: Any = None, data: Any = None, json: Any = None):
+    async def request(self, method: str, url: str, *, params: Any = None, data: Any = None, json: Any = None, headers: Dict = None):
+        (status, text, response_headers) = await self.__request(method, url, params, data, json, headers, lambda response: response.text())
+        return MglxHttpResponse(status, text, response_headers)
+
+    async def request_get(self, url: str, params: Any = None, headers: Dict = None) -> Any:
+        return await self.request('GET', url, params = params, headers = headers)
+
+    async def request_post(self, url: str, *, params: Any = None, data: Any = None, json: Any = None) -> Any:
+        return await self.request('POST', url, params = params, data = data, json = json)
+
+    async def request_json(self, method: str, url: str, *, params: Any = None, data: Any = None, json: Any = None, headers: Dict = None) -> MglxHttpJsonResponse:
+        '''
+        performs request and decodes JSON response body directly from bytes
+
+        `json` of the result is None if the body is empty or is not a valid JSON
+        '''
+        request_headers = {'Accept': 'application/json', 'Accept-Encoding': HTTP_ACCEPT_ENCODING}
+        if headers:
+            request_headers.update(headers)
+
+        (status, body, response_headers) = await self.__request(method, url, params, data, json, request_headers, lambda response: response.read())
+
+        result = None
+        if body:
+            try:
+                result = self.__json_codec.loads(body)
+            except ValueError:
+                self.__logger.warning('request_json: [%s]%s --> failed to decode JSON, status=%s, size=%s', method, url, status, len(body))
+
+        return MglxHttpJsonResponse(status, result, body, response_headers)
+
+    async def __request(self, method: str, url: str, params: Any, data: Any, json: Any, headers: Dict, read_body: Callable):
         response_status = None
-        response_text = None
+        response_body = None
+        response_headers = CIMultiDict()
+        request_method = method
+        request_url = url
+        request_start = time.monotonic()
 
         if 'Referer' in self.__session_headers:
             self.__session_headers.pop('Referer')
+
+        request_headers = self.__session_headers
+        if headers:
+            request_headers = dict(self.__session_headers)
+            request_headers.update(headers)
     
         while True:
+            trace = None
+            if self.__tracer is not None:
+                trace = self.__tracer.begin(method, url)
+
             try:
-                async with self.__session.request(method, url, headers = self.__session_headers, params = params, data = data, json = json) as response:
-                    response_text = await response.text()
+                async with self.__session.request(method, url, headers = request_headers, params = params, data = data, json = json, trace_request_ctx = trace) as response:
+                    response_body = await read_body(response)
                     response_status = response.status
+                    response_headers = response.headers.copy()
+                    if trace is not None:
+                        self.__tracer.finish(trace, response_status)
                     if response_status == 202 and 'Location' in response.headers:
                         url = response.headers['Location']
                         self.__session_headers.update({'Referer': str(response.url)})
+                        request_headers = dict(request_headers)
+                        request_headers.update({'Referer': str(response.url)})
                         method = 'GET'
                     else:
                         break
             except aiohttp.ClientConnectionError:
-                self.__logger.warn('request: [%s]%s --> aiohttp.ClientConnectionError' % (method, url))
+                self.__logger.warning('request: [%s]%s --> aiohttp.ClientConnectionError', method, url)
                 response_status = 0
                 break
             except asyncio.CancelledError:
-                self.__logger.warn('request: [%s]%s --> asyncio.CancelledError' % (method, url))
-                response_status = 499 #499 Client Closed Request
-                break
+                self.__logger.debug('request: [%s]%s --> asyncio.CancelledError', method, url)
+                if trace is not None:
+                    self.__tracer.finish(trace, 499) #499 Client Closed Request
+                raise
             except asyncio.TimeoutError:
-                self.__logger.warn('request: [%s]%s --> asyncio.TimeoutError' % (method, url))
+                self.__logger.warning('request: [%s]%s --> asyncio.TimeoutError', method, url)
                 response_status = 408 #408 Request Timeout
                 break
             except RuntimeError:
-                self.__logger.warn('request: [%s]%s --> RuntimeError' % (method, url))
+                self.__logger.warning('request: [%s]%s --> RuntimeError', method, url)
                 response_status = 0
                 break
             except TimeoutError:
-                self.__logger.warn('request: [%s]%s --> TimeoutError' % (method, url))
+                self.__logger.warning('request: [%s]%s --> TimeoutError', method, url)
                 response_status = 408 #408 Request Timeout
                 break
 
-        return collections.namedtuple('MglxHttpResponse', ['status', 'text'])(response_status, response_text)
+        if trace is not None:
+            self.__tracer.finish(trace, response_status)
 
-    async def request_get(self, url: str, params: Any = None) -> Any:
-        return await self.request('GET', url, params = params)
+        elapsed = time.monotonic() - request_start
+        self.__logger.debug('request: [%s]%s --> %s in %.3f s', request_method, request_url, response_status, elapsed)
 
-    async def request_post(self, url: str, *, params: Any = None, data: Any = None, json: Any = None) -> Any:
-        return await self.request('POST', url, params = params, data = data, json = json)
+        if self.__recorder is not None:
+            recorded_body = response_body
+            if isinstance(recorded_body, bytes):
+                recorded_body = recorded_body.decode('utf-8', errors='replace')
+            self.__recorder.record(request_method, request_url, params, response_status, response_headers, recorded_body, elapsed)
+
+        return (response_status, response_body, response_headers)
@@ -0,0 +1,164 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import collections
+import gzip
+import json
+import logging
+from typing import Any, Dict, List, Mapping
+
+from multidict import CIMultiDict
+
+from .mglx_http import MglxHttpJsonResponse, MglxHttpResponse
+from .mglx_json import get_default_codec
+
+FIXTURE_VERSION = 2
+
+def _request_key(method: str, url: str, params: Any) -> str:
+    if params is not None and not isinstance(params, str):
+        params = sorted(dict(params).items())
+    return json.dumps([method.upper(), url, params], separators=(',', ':'))
+
+def _open_fixture(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def _read_fixture(path: str) -> List[Dict]:
+    '''
+    returns fixture lines, stops at the line which was cut off when the recording process was killed
+    '''
+    result = list()
+    try:
+        with _open_fixture(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    result.append(json.loads(line))
+    except (EOFError, ValueError):
+        logging.getLogger('mglx_http_replay').warning('read_fixture: fixture %s is truncated after %s lines', path, len(result))
+    return result
+
+
+class MglxHttpRecorder:
+    '''
+    records request/response pairs of MglxHttp to the fixture file
+
+    Fixture is a JSON lines file, gzip-compressed when the path ends with `.gz`: the header line is
+    followed by one line per response. Every response is appended as soon as it is recorded, so the
+    fixture is usable even if the plugin is killed, save() rewrites it in one piece.
+    '''
+
+    def __init__(self, path: str):
+        self.__logger = logging.getLogger('mglx_http_replay')
+        self.__path = path
+        self.__entries = list()
+        self.__write('w', [{'version': FIXTURE_VERSION}])
+
+    def record(self, method: str, url: str, params: Any, status: int, headers: Mapping, body: str, elapsed: float) -> None:
+        if headers is not None:
+            headers = dict(headers)
+        if params is not None and not isinstance(params, str):
+            params = dict(params)
+
+        entry = {
+            'method': method.upper(),
+            'url': url,
+            'params': params,
+            'status': status,
+            'headers': headers,
+            'body': body,
+            'elapsed': round(elapsed, 4),
+        }
+        self.__entries.append(entry)
+        self.__write('a', [entry])
+
+    def get_entries(self) -> List[Dict]:
+        return self.__entries
+
+    def save(self) -> None:
+        self.__write('w', [{'version': FIXTURE_VERSION}] + self.__entries)
+
+    def __write(self, mode: str, lines: List[Dict]) -> None:
+        try:
+            with _open_fixture(self.__path, mode) as f:
+                for line in lines:
+                    f.write(json.dumps(line, separators=(',', ':')) + '\n')
+        except Exception:
+            self.__logger.exception('write: failed to write fixture %s', self.__path)
+
+
+class MglxHttpReplay:
+    '''
+    replay transport, drop-in replacement of MglxHttp that serves responses from the fixture file
+
+    Responses for the same request are served in recorded order, the last one is repeated
+    when the recording is exhausted. With realtime enabled the recorded latencies are reproduced.
+    '''
+
+    def __init__(self, path: str, realtime: bool = False, json_codec = None):
+        self.__logger = logging.getLogger('mglx_http_replay')
+        self.__realtime = realtime
+        self.__json_codec = json_codec if json_codec is not None else get_default_codec()
+        self.__session_headers = dict()
+
+        lines = _read_fixture(path)
+        version = lines[0].get('version') if lines else None
+        if version != FIXTURE_VERSION:
+            raise ValueError('unsupported fixture version %s' % version)
+
+        self.__responses = collections.defaultdict(collections.deque)
+        for entry in lines[1:]:
+            self.__responses[_request_key(entry['method'], entry['url'], entry['params'])].append(entry)
+
+    async def shutdown(self):
+        pass
+
+    def update_headers(self, headers: Dict):
+        '''
+        update HTTP headers
+        '''
+        self.__session_headers.update(headers)
+
+    async def request(self, method: str, url: str, *, params: Any = None, data: Any = None, json: Any = None, headers: Dict = None):
+        entry = await self.__replay(method, url, params)
+        if entry is None:
+            return MglxHttpResponse(0, None, CIMultiDict())
+
+        return MglxHttpResponse(entry['status'], entry['body'], CIMultiDict(entry['headers'] or {}))
+
+    async def request_json(self, method: str, url: str, *, params: Any = None, data: Any = None, json: Any = None, headers: Dict = None):
+        entry = await self.__replay(method, url, params)
+        if entry is None:
+            return MglxHttpJsonResponse(0, None, None, CIMultiDict())
+
+        body = entry['body'].encode('utf-8') if entry['body'] is not None else None
+        result = None
+        if body:
+            try:
+                result = self.__json_codec.loads(body)
+            except ValueError:
+                self.__logger.warning('request_json: [%s]%s --> failed to decode JSON', method, url)
+
+        return MglxHttpJsonResponse(entry['status'], result, body, CIMultiDict(entry['headers'] or {}))
+
+    async def __replay(self, method: str, url: str, params: Any):
+        responses = self.__responses.get(_request_key(method, url, params))
+        if not responses:
+            self.__logger.warning('request: [%s]%s --> not found in fixture', method, url)
+            return None
+
+        entry = responses[0]
+        if len(responses) > 1:
+            responses.popleft()
+
+        if self.__realtime:
+            await asyncio.sleep(entry['elapsed'])
+
+        return entry
+
+    async def request_get(self, url: str, params: Any = None, headers: Dict = None) -> Any:
+        return await self.request('GET', url, params = params, headers = headers)
+
+    async def request_post(self, url: str, *, params: Any = None, data: Any = None, json: Any = None) -> Any:
+        return await self.request('POST', url, params = params, data = data, json = json)
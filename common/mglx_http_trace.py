@@ -0,0 +1,214 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import collections
+import random
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+class MglxHttpTraceRecord:
+    '''
+    per-request connection timings, in seconds
+
+    `connect` covers TCP connect and TLS handshake of the new connection, DNS resolution is reported separately.
+    `ttfb` is the time from the moment the connection was acquired (created or taken from the pool)
+    to the received response headers, so it does not overlap with `queued`, `dns` and `connect`.
+    '''
+
+    def __init__(self, method: str, url: str):
+        self.method = method
+        self.url = url
+        self.status = None
+        self.error = None
+
+        self.reused = None
+        self.dns_cache_hit = None
+
+        self.queued = 0.0
+        self.dns = 0.0
+        self.connect = 0.0
+        self.ttfb = 0.0
+        self.download = 0.0
+        self.total = 0.0
+
+        self.finished = False
+
+        self._start = time.monotonic()
+        self._connected = None
+        self._headers_received = None
+        self._phase_start = dict()
+
+    def to_dict(self) -> Dict:
+        return {
+            'method': self.method,
+            'url': self.url,
+            'status': self.status,
+            'error': self.error,
+            'reused': self.reused,
+            'dns_cache_hit': self.dns_cache_hit,
+            'queued': self.queued,
+            'dns': self.dns,
+            'connect': self.connect,
+            'ttfb': self.ttfb,
+            'download': self.download,
+            'total': self.total,
+        }
+
+
+class MglxHttpTracer:
+    '''
+    collects connection-level timings of MglxHttp requests via aiohttp.TraceConfig
+    '''
+
+    TRACE_DEFAULT_SAMPLE_RATE = 1.0
+    TRACE_DEFAULT_MAX_RECORDS = 256
+
+    PHASES = ('queued', 'dns', 'connect', 'ttfb', 'download', 'total')
+
+    def __init__(self, sample_rate: float = TRACE_DEFAULT_SAMPLE_RATE, max_records: int = TRACE_DEFAULT_MAX_RECORDS):
+        self.__sample_rate = sample_rate
+        self.__records = collections.deque(maxlen=max_records)
+
+        self.__count = 0
+        self.__errors = 0
+        self.__pool_hits = 0
+        self.__pool_misses = 0
+        self.__phase_total = dict.fromkeys(self.PHASES, 0.0)
+        self.__phase_max = dict.fromkeys(self.PHASES, 0.0)
+
+    #
+    # Setup
+    #
+
+    def create_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_queued_start.append(self.__on_phase_start('queued'))
+        trace_config.on_connection_queued_end.append(self.__on_phase_end('queued'))
+        trace_config.on_dns_resolvehost_start.append(self.__on_phase_start('dns'))
+        trace_config.on_dns_resolvehost_end.append(self.__on_phase_end('dns'))
+        trace_config.on_dns_cache_hit.append(self.__on_dns_cache_hit)
+        trace_config.on_connection_create_start.append(self.__on_phase_start('connect'))
+        trace_config.on_connection_create_end.append(self.__on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self.__on_connection_reuseconn)
+        trace_config.on_request_end.append(self.__on_request_end)
+        trace_config.on_request_exception.append(self.__on_request_exception)
+        return trace_config
+
+    #
+    # Request
+    #
+
+    def begin(self, method: str, url: str) -> Optional[MglxHttpTraceRecord]:
+        '''
+        starts tracing of the request, returns None if request was not sampled
+        '''
+        if self.__sample_rate < 1.0 and random.random() >= self.__sample_rate:
+            return None
+
+        return MglxHttpTraceRecord(method, url)
+
+    def finish(self, record: Optional[MglxHttpTraceRecord], status: int) -> None:
+        if record is None or record.finished:
+            return
+
+        now = time.monotonic()
+        record.finished = True
+        record.status = status
+        record.total = now - record._start
+        if record._headers_received is not None:
+            record.download = now - record._headers_received
+
+        self.__records.append(record)
+
+        self.__count += 1
+        if record.error is not None:
+            self.__errors += 1
+        if record.reused is True:
+            self.__pool_hits += 1
+        elif record.reused is False:
+            self.__pool_misses += 1
+
+        for phase in self.PHASES:
+            value = getattr(record, phase)
+            self.__phase_total[phase] += value
+            self.__phase_max[phase] = max(self.__phase_max[phase], value)
+
+    #
+    # Info
+    #
+
+    def get_records(self) -> List[MglxHttpTraceRecord]:
+        return list(self.__records)
+
+    def get_stats(self) -> Dict:
+        stats = {
+            'count': self.__count,
+            'errors': self.__errors,
+            'pool_hits': self.__pool_hits,
+            'pool_misses': self.__pool_misses,
+        }
+
+        for phase in self.PHASES:
+            stats['%s_avg' % phase] = self.__phase_total[phase] / self.__count if self.__count else 0.0
+            stats['%s_max' % phase] = self.__phase_max[phase]
+
+        return stats
+
+    #
+    # Callbacks
+    #
+
+    @staticmethod
+    def __get_record(trace_config_ctx) -> Optional[MglxHttpTraceRecord]:
+        record = trace_config_ctx.trace_request_ctx
+        if isinstance(record, MglxHttpTraceRecord):
+            return record
+        return None
+
+    def __on_phase_start(self, phase: str):
+        async def callback(session, trace_config_ctx, params):
+            record = self.__get_record(trace_config_ctx)
+            if record is not None:
+                record._phase_start[phase] = time.monotonic()
+        return callback
+
+    def __on_phase_end(self, phase: str):
+        async def callback(session, trace_config_ctx, params):
+            record = self.__get_record(trace_config_ctx)
+            if record is not None and phase in record._phase_start:
+                setattr(record, phase, getattr(record, phase) + time.monotonic() - record._phase_start.pop(phase))
+        return callback
+
+    async def __on_dns_cache_hit(self, session, trace_config_ctx, params):
+        record = self.__get_record(trace_config_ctx)
+        if record is not None:
+            record.dns_cache_hit = True
+
+    async def __on_connection_create_end(self, session, trace_config_ctx, params):
+        record = self.__get_record(trace_config_ctx)
+        if record is None:
+            return
+
+        record.reused = False
+        record._connected = time.monotonic()
+        if 'connect' in record._phase_start:
+            record.connect = time.monotonic() - record._phase_start.pop('connect') - record.dns
+
+    async def __on_connection_reuseconn(self, session, trace_config_ctx, params):
+        record = self.__get_record(trace_config_ctx)
+        if record is not None:
+            record.reused = True
+            record._connected = time.monotonic()
+
+    async def __on_request_end(self, session, trace_config_ctx, params):
+        record = self.__get_record(trace_config_ctx)
+        if record is not None:
+            record._headers_received = time.monotonic()
+            record.ttfb = record._headers_received - (record._connected if record._connected is not None else record._start)
+
+    async def __on_request_exception(self, session, trace_config_ctx, params):
+        record = self.__get_record(trace_config_ctx)
+        if record is not None:
+            record.error = type(params.exception).__name__
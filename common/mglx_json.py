@@ -0,0 +1,36 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import json
+from typing import Any, Callable, Union
+
+class MglxJsonCodec:
+    '''
+    JSON decoder working directly on bytes
+    '''
+
+    def __init__(self, name: str, loads: Callable[[Union[bytes, str]], Any]):
+        self.name = name
+        self.__loads = loads
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self.__loads(data)
+
+
+def get_default_codec() -> MglxJsonCodec:
+    '''
+    returns the fastest available codec, falls back to the standard library
+    '''
+    try:
+        import orjson
+        return MglxJsonCodec('orjson', orjson.loads)
+    except ImportError:
+        pass
+
+    try:
+        import ujson
+        return MglxJsonCodec('ujson', ujson.loads)
+    except ImportError:
+        pass
+
+    return MglxJsonCodec('json', json.loads)
@@ -0,0 +1,112 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import collections
+import logging
+import threading
+from typing import Callable, List
+
+class MglxLifecycle:
+    '''
+    keeps track of background tasks and resources and stops them within a deadline
+
+    On shutdown the stop event is set for blocking jobs running in threads, tasks are cancelled and awaited,
+    then resources are closed in registration order. Tasks may use only part of the budget so that a task
+    ignoring cancellation does not prevent the resources from being closed. Required resources are closed
+    even when the budget is used up. Everything that did not stop in time or failed to stop is reported.
+    '''
+
+    LIFECYCLE_DEFAULT_TIMEOUT = 5
+    LIFECYCLE_TASKS_SHARE = 0.5
+    LIFECYCLE_REQUIRED_GRACE = 0.1
+
+    def __init__(self):
+        self.__logger = logging.getLogger('mglx_lifecycle')
+
+        self.__tasks = dict()
+        self.__resources = collections.OrderedDict()
+        self.__stopped = False
+        self.__stop_event = threading.Event()
+
+    #
+    # Registration
+    #
+
+    def register_task(self, task: asyncio.Task, name: str = None) -> asyncio.Task:
+        if task.done():
+            return task
+
+        self.__tasks[task] = name or repr(task)
+        task.add_done_callback(lambda t: self.__tasks.pop(t, None))
+        return task
+
+    def register_resource(self, name: str, close: Callable, required: bool = False) -> None:
+        '''
+        registers coroutine function or function which closes the resource, replaces the resource with the same name
+
+        required resources are closed even if there is no time left, with a short grace period
+        '''
+        self.__resources.pop(name, None)
+        self.__resources[name] = (close, required)
+
+    def unregister_resource(self, name: str) -> None:
+        self.__resources.pop(name, None)
+
+    def is_stopped(self) -> bool:
+        return self.__stopped
+
+    def get_stop_event(self) -> threading.Event:
+        '''
+        returns event which is set on shutdown, blocking jobs should check it and return early
+        '''
+        return self.__stop_event
+
+    #
+    # Shutdown
+    #
+
+    async def shutdown(self, timeout: float = LIFECYCLE_DEFAULT_TIMEOUT) -> List[str]:
+        '''
+        returns names of tasks and resources which failed to stop
+        '''
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        failures = list()
+        self.__stopped = True
+        self.__stop_event.set()
+
+        #tasks
+        tasks = dict(self.__tasks)
+        for task in tasks:
+            task.cancel()
+
+        if tasks:
+            _, pending = await asyncio.wait(list(tasks), timeout = timeout * self.LIFECYCLE_TASKS_SHARE)
+            for task in pending:
+                failures.append('task %s: not stopped in time' % tasks[task])
+
+        #resources
+        resources = list(self.__resources.items())
+        self.__resources.clear()
+        for name, (close, required) in resources:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                if not required:
+                    failures.append('resource %s: no time left' % name)
+                    continue
+                remaining = self.LIFECYCLE_REQUIRED_GRACE
+
+            try:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await asyncio.wait_for(result, remaining)
+            except asyncio.TimeoutError:
+                failures.append('resource %s: not closed in time' % name)
+            except Exception as e:
+                failures.append('resource %s: %s' % (name, repr(e)))
+
+        if failures:
+            self.__logger.warning('shutdown: failed to stop %s', failures)
+
+        return failures
@@ -0,0 +1,141 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import collections
+import logging
+import threading
+import time
+from typing import Any, Iterable
+
+class MglxTruncated:
+    '''
+    lazy log argument, converts value to string and truncates it only when the record is formatted
+    '''
+
+    TRUNCATED_DEFAULT_LIMIT = 256
+
+    __slots__ = ('__value', '__limit')
+
+    def __init__(self, value: Any, limit: int = TRUNCATED_DEFAULT_LIMIT):
+        self.__value = value
+        self.__limit = limit
+
+    def __str__(self) -> str:
+        value = self.__value
+        if isinstance(value, (bytes, bytearray)):
+            value = bytes(value[:self.__limit + 1]).decode('utf-8', errors='replace')
+        else:
+            value = str(value)
+
+        if len(value) <= self.__limit:
+            return value
+
+        return '%s...(truncated)' % value[:self.__limit]
+
+    __repr__ = __str__
+
+
+class MglxRateLimitFilter(logging.Filter):
+    '''
+    passes at most `burst` records with the same logger and message template per `window` seconds
+
+    The number of suppressed records is stored in the `suppressed` attribute of the next passed
+    record, the message itself is left intact so crash reporters can still group the records.
+    '''
+
+    RATELIMIT_DEFAULT_WINDOW = 60
+    RATELIMIT_DEFAULT_BURST = 5
+
+    def __init__(self, window: float = RATELIMIT_DEFAULT_WINDOW, burst: int = RATELIMIT_DEFAULT_BURST):
+        super(MglxRateLimitFilter, self).__init__()
+        self.__window = window
+        self.__burst = burst
+        self.__lock = threading.Lock()
+        self.__state = dict()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.msg)
+        now = time.monotonic()
+
+        with self.__lock:
+            window_start, count, suppressed = self.__state.get(key, (now, 0, 0))
+            if now - window_start >= self.__window:
+                window_start, count = now, 0
+
+            if count >= self.__burst:
+                self.__state[key] = (window_start, count, suppressed + 1)
+                return False
+
+            self.__state[key] = (window_start, count + 1, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class MglxRingBufferHandler(logging.Handler):
+    '''
+    keeps recent low-level records in memory and dumps them only when an error occurs
+
+    Records at pass_level and above are forwarded to the root logger handlers, lower ones
+    are kept in the ring buffer unformatted until a record at dump_level arrives. The count
+    of records suppressed by MglxRateLimitFilter is added to the forwarded message.
+    '''
+
+    RINGBUFFER_DEFAULT_CAPACITY = 200
+
+    def __init__(self, capacity: int = RINGBUFFER_DEFAULT_CAPACITY, pass_level: int = logging.INFO, dump_level: int = logging.ERROR):
+        super(MglxRingBufferHandler, self).__init__()
+        self.__buffer = collections.deque(maxlen=capacity)
+        self.__pass_level = pass_level
+        self.__dump_level = dump_level
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno < self.__pass_level:
+            self.__buffer.append(record)
+            return
+
+        if record.levelno >= self.__dump_level and self.__buffer:
+            buffered = list(self.__buffer)
+            self.__buffer.clear()
+
+            self.__forward(logging.makeLogRecord({'name': record.name, 'levelno': record.levelno, 'levelname': record.levelname,
+                'msg': 'ring buffer: %d recent records before the error', 'args': (len(buffered),)}))
+            for buffered_record in buffered:
+                self.__forward(buffered_record)
+
+        self.__forward(record)
+
+    @staticmethod
+    def __forward(record: logging.LogRecord) -> None:
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            #add the count to a copy, the original record may be still referenced by crash reporters
+            record = logging.makeLogRecord(dict(record.__dict__, msg='%s (%d similar messages suppressed)' % (record.msg, suppressed), suppressed=0))
+
+        #call root handlers directly, Logger.callHandlers may be patched by crash reporters
+        for handler in logging.getLogger().handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def install(logger_names: Iterable[str], buffer_level: int = logging.DEBUG, pass_level: int = logging.INFO,
+            capacity: int = MglxRingBufferHandler.RINGBUFFER_DEFAULT_CAPACITY, rate_limit: MglxRateLimitFilter = None) -> MglxRingBufferHandler:
+    '''
+    routes given loggers through the ring buffer and the rate limiter
+
+    buffer_level is the lowest level for which records are created at all, pass buffer_level equal to
+    pass_level to disable the ring buffer and keep lower-level calls at the cost of a level check
+    '''
+    handler = MglxRingBufferHandler(capacity, pass_level)
+    if rate_limit is None:
+        rate_limit = MglxRateLimitFilter()
+
+    for name in logger_names:
+        logger = logging.getLogger(name)
+        logger.setLevel(buffer_level)
+        logger.propagate = False
+        logger.addHandler(handler)
+        logger.addFilter(rate_limit)
+
+    return handler
@@ -0,0 +1,356 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import random
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+class MglxSentryFilter:
+    '''
+    before_send callback for sentry_sdk, samples events and rate-limits identical ones
+    '''
+
+    FILTER_DEFAULT_SAMPLE_RATE = 1.0
+    FILTER_DEFAULT_WINDOW = 600
+    FILTER_DEFAULT_MAX_PER_WINDOW = 3
+
+    def __init__(self, sample_rate: float = FILTER_DEFAULT_SAMPLE_RATE, window: float = FILTER_DEFAULT_WINDOW, max_per_window: int = FILTER_DEFAULT_MAX_PER_WINDOW):
+        self.__sample_rate = sample_rate
+        self.__window = window
+        self.__max_per_window = max_per_window
+
+        self.__lock = threading.Lock()
+        self.__seen = dict()
+        self.__dropped = 0
+
+    def __call__(self, event: Dict, hint: Any) -> Optional[Dict]:
+        if self.__sample_rate < 1.0 and random.random() >= self.__sample_rate:
+            return None
+
+        key = self.get_fingerprint(event)
+        now = time.monotonic()
+
+        with self.__lock:
+            window_start, count = self.__seen.get(key, (now, 0))
+            if now - window_start >= self.__window:
+                window_start, count = now, 0
+
+            if count >= self.__max_per_window:
+                self.__dropped += 1
+                return None
+
+            self.__seen[key] = (window_start, count + 1)
+
+            #forget outdated fingerprints
+            if len(self.__seen) > 256:
+                self.__seen = {k: v for k, v in self.__seen.items() if now - v[0] < self.__window}
+
+        return event
+
+    def get_dropped(self) -> int:
+        return self.__dropped
+
+    @staticmethod
+    def get_fingerprint(event: Dict) -> str:
+        parts = [event.get('logger'), event.get('level')]
+
+        logentry = event.get('logentry') or {}
+        parts.append(logentry.get('message') or event.get('message'))
+
+        for exception in (event.get('exception') or {}).get('values') or []:
+            parts.append(exception.get('type'))
+            frames = (exception.get('stacktrace') or {}).get('frames') or []
+            if frames:
+                parts.append('%s:%s' % (frames[-1].get('filename'), frames[-1].get('lineno')))
+
+        return json.dumps(parts, default=str)
+
+
+class MglxSentryTransport:
+    '''
+    buffered transport for sentry_sdk
+
+    Events are put into a bounded queue and sent in batches by a background thread which is
+    started on the first event, so neither startup nor the event loop waits for the network.
+    Events which could not be delivered are spooled to a bounded local file and resent after
+    the next successful delivery.
+    '''
+
+    TRANSPORT_DEFAULT_QUEUE_SIZE = 64
+    TRANSPORT_DEFAULT_BATCH_SIZE = 16
+    TRANSPORT_DEFAULT_INTERVAL = 5
+    TRANSPORT_DEFAULT_TIMEOUT = 10
+    TRANSPORT_DEFAULT_SPOOL_SIZE = 512 * 1024
+
+    #queue item which wakes up the worker on kill
+    __STOP = None
+
+    def __init__(self, dsn: str, user_agent: str, spool_path: Optional[str] = None, *,
+                 queue_size: int = TRANSPORT_DEFAULT_QUEUE_SIZE, batch_size: int = TRANSPORT_DEFAULT_BATCH_SIZE,
+                 interval: float = TRANSPORT_DEFAULT_INTERVAL, timeout: float = TRANSPORT_DEFAULT_TIMEOUT,
+                 spool_size: int = TRANSPORT_DEFAULT_SPOOL_SIZE, ssl_context: Optional[ssl.SSLContext] = None):
+        self.__logger = logging.getLogger('mglx_sentry')
+
+        dsn_parsed = urllib.parse.urlsplit(dsn)
+        project_id = dsn_parsed.path.rstrip('/').rsplit('/', 1)[-1]
+        path = dsn_parsed.path[:-len(project_id)] if project_id else dsn_parsed.path
+        self.__url = '%s://%s%sapi/%s/store/' % (dsn_parsed.scheme, dsn_parsed.netloc.rsplit('@', 1)[-1], path or '/', project_id)
+        self.__auth = 'Sentry sentry_version=7, sentry_client=%s, sentry_key=%s' % (user_agent, dsn_parsed.username)
+        self.__user_agent = user_agent
+
+        self.__spool_path = spool_path
+        self.__spool_size = spool_size
+        self.__batch_size = batch_size
+        self.__interval = interval
+        self.__timeout = timeout
+        self.__ssl_context = ssl_context
+
+        self.__queue = queue.Queue(maxsize=queue_size)
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.__stop_event = threading.Event()
+
+        self.__sent = 0
+        self.__dropped = 0
+        self.__spooled = 0
+
+    #
+    # sentry_sdk transport
+    #
+
+    def __call__(self, event: Dict) -> None:
+        self.capture_event(event)
+
+    def capture_event(self, event: Dict) -> None:
+        if self.__stop_event.is_set():
+            self.__dropped += 1
+            return
+
+        try:
+            self.__queue.put_nowait(json.dumps(event, default=str))
+        except queue.Full:
+            self.__dropped += 1
+            return
+
+        self.__ensure_thread()
+
+    def flush(self, timeout: float) -> bool:
+        '''
+        waits until queued events are sent or spooled
+        '''
+        deadline = time.monotonic() + timeout
+        with self.__queue.all_tasks_done:
+            while self.__queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.__queue.all_tasks_done.wait(remaining)
+        return True
+
+    def kill(self, timeout: float = 1.0) -> None:
+        '''
+        stops the worker, events which are still queued are spooled by the worker before it exits
+        '''
+        self.__stop_event.set()
+        if self.__thread is None:
+            return
+
+        #wake up the worker, if the queue is full it checks the stop event after the current batch
+        try:
+            self.__queue.put_nowait(self.__STOP)
+        except queue.Full:
+            pass
+
+        self.__thread.join(timeout)
+        if self.__thread.is_alive():
+            self.__logger.debug('kill: worker did not stop within %s s', timeout)
+
+    async def shutdown(self, timeout: float) -> bool:
+        '''
+        flushes and stops the transport on a dedicated thread, returns False if not all events were processed
+
+        Neither the event loop nor the shared thread pools are blocked while the events are being sent.
+        '''
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        def set_result(result: bool) -> None:
+            if not future.done():
+                future.set_result(result)
+
+        def stop() -> None:
+            result = self.flush(timeout)
+            self.kill()
+            try:
+                loop.call_soon_threadsafe(set_result, result)
+            except RuntimeError:
+                #event loop is already closed
+                pass
+
+        threading.Thread(target=stop, name='mglx_sentry_shutdown', daemon=True).start()
+        return await future
+
+    def get_stats(self) -> Dict:
+        return {
+            'queued': self.__queue.qsize(),
+            'sent': self.__sent,
+            'dropped': self.__dropped,
+            'spooled': self.__spooled,
+        }
+
+    #
+    # Worker
+    #
+
+    def __ensure_thread(self) -> None:
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__worker, name='mglx_sentry', daemon=True)
+                self.__thread.start()
+
+    def __worker(self) -> None:
+        online = self.__send_spool()
+
+        while not self.__stop_event.is_set():
+            try:
+                first = self.__queue.get(timeout=self.__interval)
+            except queue.Empty:
+                if not online:
+                    online = self.__send_spool()
+                continue
+
+            batch = [first] + self.__drain_queue(self.__batch_size - 1)
+            events = [payload for payload in batch if payload is not self.__STOP]
+            if events and online and not self.__stop_event.is_set():
+                undelivered = self.__send_batch(events)
+                if undelivered:
+                    online = False
+                    self.__spool_append(undelivered)
+                else:
+                    online = self.__send_spool()
+            elif events:
+                self.__spool_append(events)
+
+            self.__task_done(len(batch))
+
+        #spool events which were queued after the last batch, nobody else touches the spool
+        remaining = self.__drain_queue(self.__queue.qsize())
+        events = [payload for payload in remaining if payload is not self.__STOP]
+        if events:
+            self.__spool_append(events)
+        self.__task_done(len(remaining))
+
+    def __drain_queue(self, count: int) -> List[str]:
+        result = list()
+        while len(result) < count:
+            try:
+                result.append(self.__queue.get_nowait())
+            except queue.Empty:
+                break
+        return result
+
+    def __task_done(self, count: int) -> None:
+        for _ in range(count):
+            self.__queue.task_done()
+
+    def __send_batch(self, batch: List[str]) -> List[str]:
+        '''
+        sends events, returns the events which were not delivered because of network failure
+        '''
+        for index, payload in enumerate(batch):
+            if not self.__send(payload):
+                return batch[index:]
+        return list()
+
+    def __send(self, payload: str) -> bool:
+        '''
+        returns False if the endpoint is unavailable and the event should be retried later
+        '''
+        request = urllib.request.Request(self.__url, data=payload.encode('utf-8'), method='POST', headers={
+            'Content-Type': 'application/json',
+            'User-Agent': self.__user_agent,
+            'X-Sentry-Auth': self.__auth,
+        })
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.__timeout, context=self.__ssl_context) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                return False
+            self.__logger.debug('send: event rejected with status %s', e.code)
+            self.__dropped += 1
+            return True
+        except (urllib.error.URLError, OSError):
+            return False
+
+        self.__sent += 1
+        return True
+
+    #
+    # Spool
+    #
+
+    def __send_spool(self) -> bool:
+        '''
+        resends spooled events, returns False if the endpoint is still unavailable
+        '''
+        if not self.__spool_path or not os.path.exists(self.__spool_path):
+            return True
+
+        spooled = self.__spool_read()
+        undelivered = self.__send_batch(spooled)
+        self.__spool_write(undelivered)
+        return not undelivered
+
+    def __spool_append(self, payloads: List[str]) -> None:
+        if not self.__spool_path:
+            self.__dropped += len(payloads)
+            return
+
+        self.__spooled += len(payloads)
+        self.__spool_write(self.__spool_read() + payloads)
+
+    def __spool_read(self) -> List[str]:
+        try:
+            with open(self.__spool_path, mode='r', encoding='utf-8') as f:
+                return [line.rstrip('\n') for line in f if line.strip()]
+        except FileNotFoundError:
+            return list()
+        except Exception:
+            self.__logger.debug('spool_read: failed to read spool', exc_info=True)
+            return list()
+
+    def __spool_write(self, payloads: List[str]) -> None:
+        #keep the newest events within the size limit
+        size = 0
+        kept = list()
+        for payload in reversed(payloads):
+            if size + len(payload) + 1 > self.__spool_size:
+                self.__dropped += 1
+                continue
+            size += len(payload) + 1
+            kept.append(payload)
+        kept.reverse()
+
+        try:
+            if not kept:
+                if os.path.exists(self.__spool_path):
+                    os.remove(self.__spool_path)
+                return
+
+            with open(self.__spool_path, mode='w', encoding='utf-8') as f:
+                for payload in kept:
+                    f.write(payload + '\n')
+        except Exception:
+            self.__logger.debug('spool_write: failed to write spool', exc_info=True)
@@ -0,0 +1,139 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import logging
+import math
+import sys
+import threading
+import time
+import traceback
+from typing import Dict
+
+class MglxLoopWatchdog:
+    '''
+    detects event loop stalls
+
+    A heartbeat coroutine runs on the loop and a monitor thread checks its age. When a
+    callback blocks the loop for longer than the threshold, the stack of the loop thread
+    is captured while it is still blocked and written to the log.
+    '''
+
+    WATCHDOG_DEFAULT_THRESHOLD = 0.25
+    WATCHDOG_DEFAULT_INTERVAL = 0.05
+
+    def __init__(self, threshold: float = WATCHDOG_DEFAULT_THRESHOLD, interval: float = WATCHDOG_DEFAULT_INTERVAL):
+        self.__logger = logging.getLogger('mglx_watchdog')
+
+        if not math.isfinite(threshold) or threshold <= interval:
+            raise ValueError('threshold %s must be finite and greater than heartbeat interval %s' % (threshold, interval))
+
+        self.__threshold = threshold
+        self.__interval = interval
+
+        self.__loop_thread_id = None
+        self.__last_beat = None
+        self.__stall_reported = False
+        self.__stop_event = threading.Event()
+
+        self.__task = None
+        self.__thread = None
+
+        self.__beats = 0
+        self.__lag_total = 0.0
+        self.__lag_max = 0.0
+        self.__stalls = 0
+        self.__stall_max = 0.0
+        self.__last_stack = None
+
+    #
+    # Start/Stop
+    #
+
+    def start(self) -> bool:
+        '''
+        starts the watchdog, must be called from the event loop thread
+        '''
+        if self.__task is not None:
+            self.__logger.warning('start: watchdog is already started')
+            return False
+
+        self.__loop_thread_id = threading.get_ident()
+        self.__last_beat = time.monotonic()
+        self.__stop_event.clear()
+
+        self.__task = asyncio.get_event_loop().create_task(self.__heartbeat())
+        self.__thread = threading.Thread(target=self.__monitor, name='mglx_watchdog', daemon=True)
+        self.__thread.start()
+        return True
+
+    async def shutdown(self) -> None:
+        self.__stop_event.set()
+
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+        if self.__thread is not None:
+            self.__thread.join(self.__interval * 2)
+            self.__thread = None
+
+    #
+    # Info
+    #
+
+    def get_stats(self) -> Dict:
+        return {
+            'lag_avg': self.__lag_total / self.__beats if self.__beats else 0.0,
+            'lag_max': self.__lag_max,
+            'stalls': self.__stalls,
+            'stall_max': self.__stall_max,
+        }
+
+    def get_last_stack(self) -> str:
+        return self.__last_stack
+
+    #
+    # Internals
+    #
+
+    async def __heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.__interval
+            await asyncio.sleep(self.__interval)
+
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+
+            if self.__stall_reported:
+                stall = now - self.__last_beat
+                self.__stall_max = max(self.__stall_max, stall)
+                self.__logger.warning('heartbeat: event loop was blocked for %.3f s', stall)
+                self.__stall_reported = False
+
+            self.__last_beat = now
+            self.__beats += 1
+            self.__lag_total += lag
+            self.__lag_max = max(self.__lag_max, lag)
+
+    def __monitor(self):
+        while not self.__stop_event.wait(self.__interval):
+            if self.__stall_reported:
+                continue
+
+            age = time.monotonic() - self.__last_beat
+            if age < self.__threshold:
+                continue
+
+            frame = sys._current_frames().get(self.__loop_thread_id)
+            if frame is None:
+                continue
+
+            self.__stall_reported = True
+            self.__stalls += 1
+            self.__last_stack = ''.join(traceback.format_stack(frame))
+            self.__logger.warning('monitor: event loop is blocked for %.3f s, stack:\n%s', age, self.__last_stack)
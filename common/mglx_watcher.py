@@ -0,0 +1,385 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import abc
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+from typing import Callable, Dict, Iterable, Optional
+
+from .mglx_executor import MglxExecutor
+
+class MglxWatcherBackend(abc.ABC):
+    '''
+    base class of filesystem notification backends
+
+    Backend watches the given files and directories (non-recursively) and calls on_change
+    with the changed path from the event loop thread. Blocking work goes to the executor if it is given.
+    '''
+
+    name = 'base'
+
+    def __init__(self, paths: Iterable[str], on_change: Callable[[str], None], executor: Optional[MglxExecutor] = None):
+        self._logger = logging.getLogger('mglx_watcher')
+        self._paths = list(paths)
+        self._on_change = on_change
+        self._executor = executor
+
+    @staticmethod
+    def is_supported() -> bool:
+        return False
+
+    @abc.abstractmethod
+    async def start(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def shutdown(self) -> None:
+        pass
+
+
+class MglxPollingBackend(MglxWatcherBackend):
+    '''
+    fallback backend, compares snapshots of the watched paths
+    '''
+
+    name = 'polling'
+
+    POLLING_DEFAULT_INTERVAL = 10
+
+    def __init__(self, paths: Iterable[str], on_change: Callable[[str], None], executor: Optional[MglxExecutor] = None, interval: float = POLLING_DEFAULT_INTERVAL):
+        super(MglxPollingBackend, self).__init__(paths, on_change, executor)
+        self.__interval = interval
+        self.__task = None
+
+    @staticmethod
+    def is_supported() -> bool:
+        return True
+
+    async def start(self) -> None:
+        snapshot = await self.__take_snapshot()
+        self.__task = asyncio.get_event_loop().create_task(self.__worker(snapshot))
+
+    async def shutdown(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+    async def __worker(self, snapshot: Dict):
+        while True:
+            await asyncio.sleep(self.__interval)
+
+            current = await self.__take_snapshot()
+            for path in set(snapshot) | set(current):
+                if snapshot.get(path) != current.get(path):
+                    self._on_change(path)
+            snapshot = current
+
+    async def __take_snapshot(self) -> Dict:
+        if self._executor is not None:
+            return await self._executor.run('watcher_snapshot', self.__snapshot, key=('watcher_snapshot', id(self)))
+        return await asyncio.get_event_loop().run_in_executor(None, self.__snapshot)
+
+    def __snapshot(self) -> Dict:
+        result = dict()
+        for path in self._paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            result[path] = (stat.st_mtime_ns, stat.st_size)
+            if not os.path.isdir(path):
+                continue
+
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            stat = entry.stat(follow_symlinks=False)
+                            result[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+        return result
+
+
+class MglxInotifyBackend(MglxWatcherBackend):
+    '''
+    Linux backend based on inotify(7)
+
+    Paths which do not exist yet are waited for by watching their nearest existing ancestor,
+    the path is reported as changed once it appears.
+    '''
+
+    name = 'inotify'
+
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, paths: Iterable[str], on_change: Callable[[str], None], executor: Optional[MglxExecutor] = None):
+        super(MglxInotifyBackend, self).__init__(paths, on_change, executor)
+        self.__libc = None
+        self.__fd = None
+        self.__watches = dict()
+        self.__missing = dict()
+
+    @staticmethod
+    def is_supported() -> bool:
+        return sys.platform.startswith('linux') and ctypes.util.find_library('c') is not None
+
+    async def start(self) -> None:
+        self.__libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        self.__fd = self.__libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        for path in self._paths:
+            self.__watch(path)
+
+        #none of the paths or their ancestors can be watched, let the watcher fall back to another backend
+        if not self.__watches:
+            os.close(self.__fd)
+            self.__fd = None
+            self.__missing.clear()
+            raise OSError('inotify: no watchable path in %s' % self._paths)
+
+        asyncio.get_event_loop().add_reader(self.__fd, self.__on_readable)
+
+    async def shutdown(self) -> None:
+        if self.__fd is None:
+            return
+
+        asyncio.get_event_loop().remove_reader(self.__fd)
+        os.close(self.__fd)
+        self.__fd = None
+        self.__watches.clear()
+        self.__missing.clear()
+
+    def __watch(self, path: str) -> None:
+        '''
+        watches the path or, if it does not exist, its nearest existing ancestor
+        '''
+        target = path
+        while not os.path.exists(target):
+            parent = os.path.dirname(target)
+            if parent == target:
+                break
+            target = parent
+
+        wd = self.__libc.inotify_add_watch(self.__fd, os.fsencode(target), self.WATCH_MASK)
+        if wd < 0:
+            self._logger.warning('watch: failed to watch %s, errno %s', target, ctypes.get_errno())
+            return
+
+        self.__watches[wd] = target
+        if target == path:
+            self.__missing.pop(path, None)
+        else:
+            self._logger.debug('watch: path %s does not exist, watching %s', path, target)
+            self.__missing[path] = target
+
+    def __unwatch_unused(self) -> None:
+        used = set(self._paths) | set(self.__missing.values())
+        for wd, path in list(self.__watches.items()):
+            if path not in used:
+                self.__libc.inotify_rm_watch(self.__fd, wd)
+                self.__watches.pop(wd, None)
+
+    def __check_missing(self) -> None:
+        appeared = list()
+        for path in list(self.__missing):
+            self.__watch(path)
+            if path not in self.__missing:
+                appeared.append(path)
+
+        if appeared:
+            self.__unwatch_unused()
+            for path in appeared:
+                self._on_change(path)
+
+    def __on_readable(self) -> None:
+        try:
+            data = os.read(self.__fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        check_missing = False
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                for path in self._paths:
+                    self._on_change(path)
+                check_missing = True
+                continue
+
+            path = self.__watches.get(wd)
+            if path is None:
+                continue
+
+            if mask & self.IN_IGNORED:
+                #watched directory was removed, wait for it to appear again
+                self.__watches.pop(wd, None)
+                if path in self._paths:
+                    self.__missing[path] = None
+                check_missing = True
+                continue
+
+            if path in self.__missing.values():
+                check_missing = True
+
+            if path in self._paths:
+                self._on_change(os.path.join(path, os.fsdecode(name)) if name else path)
+
+        if check_missing:
+            self.__check_missing()
+
+
+class MglxWatcher:
+    '''
+    debounced filesystem watcher
+
+    Changes of the watched paths which pass the filter are collected and passed to the
+    callback once no new changes arrived during the debounce window. Backends are tried in
+    registration order, OS-native backends can be added with register_backend().
+    '''
+
+    WATCHER_DEFAULT_DEBOUNCE = 2
+
+    _backends = [MglxInotifyBackend, MglxPollingBackend]
+
+    def __init__(self, callback: Callable, debounce: float = WATCHER_DEFAULT_DEBOUNCE, path_filter: Optional[Callable[[str], bool]] = None,
+                 executor: Optional[MglxExecutor] = None):
+        self.__logger = logging.getLogger('mglx_watcher')
+
+        self.__callback = callback
+        self.__debounce = debounce
+        self.__path_filter = path_filter
+        self.__executor = executor
+
+        self.__paths = None
+        self.__backend = None
+        self.__pending = set()
+        self.__handle = None
+        self.__task = None
+
+    @classmethod
+    def register_backend(cls, backend: type) -> None:
+        '''
+        registers backend with higher priority than the built-in ones
+        '''
+        cls._backends.insert(0, backend)
+
+    #
+    # Start/Stop
+    #
+
+    def is_started(self) -> bool:
+        return self.__backend is not None
+
+    def get_backend_name(self) -> Optional[str]:
+        return self.__backend.name if self.__backend is not None else None
+
+    async def start(self, paths: Iterable[str]) -> bool:
+        await self.set_paths(paths)
+        return self.__backend is not None
+
+    async def set_paths(self, paths: Iterable[str]) -> None:
+        paths = sorted(set(paths))
+        if self.__backend is not None and paths == self.__paths:
+            return
+
+        await self.__stop_backend()
+        self.__paths = paths
+
+        for backend_class in self._backends:
+            if not backend_class.is_supported():
+                continue
+
+            backend = backend_class(paths, self.__on_change, self.__executor)
+            try:
+                await backend.start()
+            except Exception:
+                self.__logger.exception('set_paths: failed to start backend %s', backend_class.name)
+                continue
+
+            self.__backend = backend
+            self.__logger.info('set_paths: using %s backend for %s', backend.name, paths)
+            return
+
+        self.__logger.error('set_paths: no filesystem watcher backend is available')
+
+    async def shutdown(self) -> None:
+        await self.__stop_backend()
+
+        if self.__handle is not None:
+            self.__handle.cancel()
+            self.__handle = None
+
+        if self.__task is not None and not self.__task.done():
+            self.__task.cancel()
+
+    async def __stop_backend(self) -> None:
+        if self.__backend is not None:
+            await self.__backend.shutdown()
+            self.__backend = None
+
+    #
+    # Events
+    #
+
+    def __on_change(self, path: str) -> None:
+        if self.__path_filter is not None and not self.__path_filter(path):
+            return
+
+        self.__pending.add(path)
+
+        if self.__handle is not None:
+            self.__handle.cancel()
+        self.__handle = asyncio.get_event_loop().call_later(self.__debounce, self.__fire)
+
+    def __fire(self) -> None:
+        self.__handle = None
+
+        #wait for the previous callback
+        if self.__task is not None and not self.__task.done():
+            self.__handle = asyncio.get_event_loop().call_later(self.__debounce, self.__fire)
+            return
+
+        paths = self.__pending
+        self.__pending = set()
+
+        result = self.__callback(paths)
+        if asyncio.iscoroutine(result):
+            self.__task = asyncio.get_event_loop().create_task(result)
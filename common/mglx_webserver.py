@@ -63,8 +63,21 @@ class MglxWebserver():
 
 
     async def shutdown(self):    
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                self._logger.exception('shutdown: worker failed')
+            self.__task = None
+
         if self.__runner is not None:
-            await self.__runner.cleanup()
+            runner = self.__runner
+            self.__runner = None
+            self.__site = None
+            await runner.cleanup()
 
 
     async def __worker(self, host, port):
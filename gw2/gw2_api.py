@@ -1,8 +1,8 @@
 # (c) 2019-2020 Mikhail Paulyshka
 # SPDX-License-Identifier: MIT
 
+import asyncio
 import logging
-import json
 import os
 import random
 import string
@@ -13,6 +13,9 @@ from urllib.parse import parse_qs
 from typing import Dict, List
 
 import common.mglx_http
+import common.mglx_http_replay
+import common.mglx_logging
+import common.mglx_http_trace
 
 from .gw2_constants import GW2AuthorizationResult
 
@@ -29,20 +32,41 @@ class GW2API(object):
 
     RETRIES_COUNT = 5
 
-    def __init__(self, plugin_version):
-        self.__http = common.mglx_http.MglxHttp(user_agent='gog_gw2/%s' % plugin_version, verify_ssl=False)
+    TRACE_SAMPLE_RATE = 1.0
+
+    def __init__(self, plugin_version, http = None, record_path = None):
+        '''
+        http replaces the built-in transport (e.g. with MglxHttpReplay), record_path enables recording of
+        the built-in transport responses to the fixture file
+        '''
         self.__logger = logging.getLogger('gw2_api')
+        self.__tracer = common.mglx_http_trace.MglxHttpTracer(sample_rate=self.TRACE_SAMPLE_RATE)
+
+        self.__http = http
+        if self.__http is None:
+            recorder = None
+            if record_path:
+                self.__logger.info('__init__: recording HTTP responses to %s', record_path)
+                recorder = common.mglx_http_replay.MglxHttpRecorder(record_path)
+
+            self.__http = common.mglx_http.MglxHttp(user_agent='gog_gw2/%s' % plugin_version, verify_ssl=False, recorder=recorder, tracer=self.__tracer)
 
         self._api_key = None
         self._account_info = None
 
+        self.__etags = dict()
+
     async def shutdown(self):
+        self.__logger.info('shutdown: http stats %s', self.get_http_stats())
         await self.__http.shutdown()
 
     # 
     # Getters
     #
 
+    def get_http_stats(self) -> Dict:
+        return self.__tracer.get_stats()
+
     def get_api_key(self) -> str:
         return self._api_key
 
@@ -86,7 +110,7 @@ class GW2API(object):
 
         (status, achievements_account) = await self.__api_get_response(self._api_key, self.API_URL_ACCOUNT_ACHIVEMENTS)
         if status != 200:
-            self.__logger.warn('get_account_achievements: failed to get achievements %s' % status)
+            self.__logger.warning('get_account_achievements: failed to get achievements %s', status)
             return result
 
         for achievement in achievements_account:
@@ -95,6 +119,25 @@ class GW2API(object):
 
         return result
 
+    async def refresh_account_info(self) -> bool:
+        '''
+        refresh account info, returns True if the list of owned games was changed
+        '''
+        if not self._api_key or self._account_info is None:
+            return False
+
+        (status, account_info) = await self.__api_get_response(self._api_key, self.API_URL_ACCOUNT, conditional = True)
+        if status == 304:
+            return False
+
+        if status != 200 or account_info is None:
+            self.__logger.warning('refresh_account_info: failed to refresh account info %s', status)
+            return False
+
+        changed = account_info.get('access') != self._account_info.get('access')
+        self._account_info = account_info
+        return changed
+
     #
     # Authorization server
     #
@@ -102,9 +145,10 @@ class GW2API(object):
     async def do_auth_apikey(self, api_key : str) -> GW2AuthorizationResult:
         self._api_key = None
         self._account_info = None
+        self.__etags.clear()
 
         if not api_key: 
-            self.__logger.warn('do_auth_apikey: api_key is is None')
+            self.__logger.warning('do_auth_apikey: api_key is is None')
             return GW2AuthorizationResult.FAILED
 
         (status_code, account_info) = await self.__api_get_response(api_key, self.API_URL_ACCOUNT)
@@ -122,13 +166,13 @@ class GW2API(object):
                 elif account_info['text'] == 'ErrTimeout':
                     return GW2AuthorizationResult.FAILED_TIMEOUT
                 else:
-                    self.__logger.error('do_auth_apikey: unknown error description %s, %s' % (status_code, account_info))
+                    self.__logger.error('do_auth_apikey: unknown error description %s, %s', status_code, common.mglx_logging.MglxTruncated(account_info))
 
-            self.__logger.warn('do_auth_apikey: %s, %s' % (status_code, account_info))
+            self.__logger.warning('do_auth_apikey: %s, %s', status_code, common.mglx_logging.MglxTruncated(account_info))
             return GW2AuthorizationResult.FAILED
 
         if account_info is None:
-            self.__logger.warn('do_auth_apikey: account info is None')
+            self.__logger.warning('do_auth_apikey: account info is None')
             return GW2AuthorizationResult.FAILED
 
         self._api_key = api_key
@@ -136,41 +180,58 @@ class GW2API(object):
         return GW2AuthorizationResult.FINISHED
 
 
-    async def __api_get_response(self, api_key, url, parameters = None):
+    async def __api_get_response(self, api_key, url, parameters = None, conditional = False):
         result = None
 
         #update authorization cookie
         self.__http.update_headers({'Authorization': 'Bearer ' + api_key})
 
+        #use entity tag of the previous response
+        headers = None
+        if conditional and url in self.__etags:
+            headers = {'If-None-Match': self.__etags[url]}
+
         #make request
+        resp = None
         retries = self.RETRIES_COUNT
         while retries > 0:
             #decrement remaining retries counter
             retries = retries - 1
+            if resp is not None:
+                self.__logger.debug('__api_get_response: retrying url %s after status %s, %d retries left', url, resp.status, retries)
 
             #send request
             resp = None
             try:
-                resp = await self.__http.request_get(self.API_DOMAIN+url, params=parameters)
+                resp = await self.__http.request_json('GET', self.API_DOMAIN+url, params=parameters, headers=headers)
+            except asyncio.CancelledError:
+                raise
             except Exception:
-                self.__logger.exception('__api_get_response: failed to perform GET request for url %s' % url)
+                self.__logger.exception('__api_get_response: failed to perform GET request for url %s', url)
                 return (0, None)
 
             #log response status
             if resp.status == 400:
-                self.__logger.warning('__api_get_response: TIMEOUT for url %s' % url)
+                self.__logger.warning('__api_get_response: TIMEOUT for url %s', url)
             elif resp.status == 404:
-                self.__logger.error('__api_get_response: NOT FOUND for url %s' % url)
+                self.__logger.error('__api_get_response: NOT FOUND for url %s', url)
             elif resp.status == 502:
-                self.__logger.warning('__api_get_response: BAD GATEWAY for url %s' % url)
+                self.__logger.warning('__api_get_response: BAD GATEWAY for url %s', url)
             elif resp.status == 504:
-                self.__logger.warning('__api_get_response: GATEWAY TIMEOUT for url %s' % url)
-            elif (resp.status == 200) and (resp.text is not None):   
-                try: 
-                    result = json.loads(resp.text)
-                except Exception:
-                    self.__logger.exception('__api_get_response: failed to parse response, url=%s, status=%s, text=%s' % (url, resp.status, resp.text))
+                self.__logger.warning('__api_get_response: GATEWAY TIMEOUT for url %s', url)
+            elif resp.status == 304:
+                break
+            elif (resp.status == 200) and (resp.body is not None):
+                if resp.json is None:
+                    self.__logger.error('__api_get_response: failed to parse response, url=%s, status=%s, text=%s', url, resp.status, common.mglx_logging.MglxTruncated(resp.body))
+                    continue
+
+                result = resp.json
+
+                if conditional and 'ETag' in resp.headers:
+                    self.__etags[url] = resp.headers['ETag']
+                break
             else:
-                self.__logger.error('__api_get_response: unknown error, url=%s, status=%s, text=%s' % (url, resp.status, resp.text))
+                self.__logger.error('__api_get_response: unknown error, url=%s, status=%s, text=%s', url, resp.status, common.mglx_logging.MglxTruncated(resp.body))
 
         return (resp.status, result)
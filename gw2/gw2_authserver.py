@@ -1,6 +1,7 @@
 # (c) 2019-2020 Mikhail Paulyshka
 # SPDX-License-Identifier: MIT
 
+import asyncio
 import os.path
 
 import aiohttp
@@ -55,6 +56,8 @@ class Gw2AuthServer(common.mglx_webserver.MglxWebserver):
         auth_result = None
         try:
             auth_result = await self.__gw2api.do_auth_apikey(data['apikey'])
+        except asyncio.CancelledError:
+            raise
         except Exception:
             self._logger.exception("exception on doing auth:")
             raise aiohttp.web.HTTPFound('/login_baddata')
@@ -1,14 +1,16 @@
 # (c) 2019-2020 Mikhail Paulyshka
 # SPDX-License-Identifier: MIT
 
-import asyncio
 import logging
 import os
 import platform
 import subprocess
-from typing import List
+import threading
+from typing import List, Optional
 import xml.etree.ElementTree as ElementTree
 
+from galaxy.proc_tools import process_iter
+
 class GWLocalGame(object):
     def __init__(self, game_dir, game_executable):
         self.__logger = logging.getLogger('gw2_local_game')
@@ -16,23 +18,31 @@ class GWLocalGame(object):
         self.__executable = game_executable
         self.__creationflags = 0x00000008 if platform.system() == 'Windows' else 0
 
-    async def get_app_size(self) -> int:
+    def get_app_size(self, stop_event: Optional[threading.Event] = None) -> int:
+        '''
+        blocking, should be called from the executor
+
+        returns partial size if stop_event is set during the scan
+        '''
         total_size = 0
         try:
             for dirpath, _, filenames in os.walk(self.__directory):
                 for f in filenames:
-                    await asyncio.sleep(0)
+                    if stop_event is not None and stop_event.is_set():
+                        self.__logger.info('get_app_size: interrupted')
+                        return total_size
+
                     fp = os.path.join(dirpath, f)
                     if not os.path.islink(fp):
                         total_size += os.path.getsize(fp)
-        except asyncio.CancelledError:
-            self.__logger.warn('get_app_size: cancelled')
-            return total_size
         except Exception:
             self.__logger.exception('get_app_size:')
 
         return total_size
 
+    def directory(self) -> str:
+        return self.__directory
+
     def exe_name(self) -> str:
         return os.path.basename(self.__executable)
 
@@ -43,26 +53,33 @@ class GWLocalGame(object):
         subprocess.Popen([os.path.join(self.__directory, self.__executable), '--uninstall'], creationflags=self.__creationflags, cwd=self.__directory)
 
 
+MACOS_GAME_LOCATION = '/Applications/Guild Wars 2 64-bit.app'
+MACOS_GAME_EXECUTABLE = 'Contents/MacOS/GuildWars2'
+
+def get_config_dir_windows() -> str:
+    return os.path.expandvars('%APPDATA%\\Guild Wars 2\\')
+
 def get_game_instances_macos() -> List[GWLocalGame]:
     result = list()
-    game_location = '/Applications/Guild Wars 2 64-bit.app'
-    executable = 'Contents/MacOS/GuildWars2'
     
-    if os.path.exists(os.path.join(game_location, executable)):
-        result.append(GWLocalGame(game_location, executable))
+    if os.path.exists(os.path.join(MACOS_GAME_LOCATION, MACOS_GAME_EXECUTABLE)):
+        result.append(GWLocalGame(MACOS_GAME_LOCATION, MACOS_GAME_EXECUTABLE))
     
     return result
 
 
-def get_game_instances_windows() -> List[GWLocalGame]:
+def get_game_instances_windows(stop_event: Optional[threading.Event] = None) -> List[GWLocalGame]:
     result = list()
 
-    config_dir = os.path.expandvars('%APPDATA%\\Guild Wars 2\\')
+    config_dir = get_config_dir_windows()
     if not os.path.exists(config_dir):
         return result
 
     for _, _, files in os.walk(config_dir):
         for file_n in files:
+            if stop_event is not None and stop_event.is_set():
+                return result
+
             file_name = file_n.lower()
             if file_name.startswith('gfxsettings') and file_name.endswith('.exe.xml'):
                 try:
@@ -74,14 +91,99 @@ def get_game_instances_windows() -> List[GWLocalGame]:
                     if os.path.exists(os.path.join(game_dir,game_executable)):
                         result.append(GWLocalGame(game_dir.lower(),game_executable.lower()))
                 except ElementTree.ParseError:
-                    logging.getLogger('gw2_local_game').warn('get_game_instances_windows: failed to parse XML file %s' % file_name)
+                    logging.getLogger('gw2_local_game').warning('get_game_instances_windows: failed to parse XML file %s', file_name)
                 except PermissionError:
-                    logging.getLogger('gw2_local_game').warn('get_game_instances_windows: permission error')
+                    logging.getLogger('gw2_local_game').warning('get_game_instances_windows: permission error')
 
     return result
 
-def get_game_instances() -> List[GWLocalGame]:
+def get_watch_paths(instances: List[GWLocalGame]) -> List[str]:
+    '''
+    returns paths which should be watched for installation changes
+    '''
+    if platform.system() == 'Darwin':
+        result = [MACOS_GAME_LOCATION]
+    else:
+        result = [os.path.normpath(get_config_dir_windows())]
+
+    for instance in instances:
+        result.append(os.path.normpath(instance.directory()))
+
+    return result
+
+def is_gfxsettings_file(path: str) -> bool:
+    file_name = os.path.basename(path).lower()
+    return file_name.startswith('gfxsettings') and file_name.endswith('.exe.xml')
+
+def is_relevant_path(path: str) -> bool:
+    '''
+    checks if the change of the given path may affect installed instances or their size
+    '''
+    path = os.path.normpath(path)
+    parent = os.path.dirname(path)
+
+    if platform.system() == 'Darwin':
+        return True
+
+    config_dir = os.path.normpath(get_config_dir_windows())
+    if parent.lower() == config_dir.lower():
+        return is_gfxsettings_file(path)
+
+    return True
+
+def is_instances_path(path: str, instances: List[GWLocalGame]) -> bool:
+    '''
+    checks if the change of the given path may add or remove instances
+
+    These are the config files, the install directories themselves and the paths to the executables,
+    other changes inside install directories affect only the size.
+    '''
+    path = os.path.normpath(path).lower()
+
+    if platform.system() == 'Darwin':
+        locations = [(MACOS_GAME_LOCATION, MACOS_GAME_EXECUTABLE)]
+    else:
+        config_dir = os.path.normpath(get_config_dir_windows()).lower()
+        if path == config_dir:
+            return True
+        if os.path.dirname(path) == config_dir:
+            return is_gfxsettings_file(path)
+        locations = [(instance.directory(), instance.exe_name()) for instance in instances]
+
+    for directory, executable in locations:
+        directory = os.path.normpath(directory).lower()
+        executable = os.path.normpath(os.path.join(directory, executable)).lower()
+
+        #install directory itself or a path between it and the executable
+        if path == directory or path == executable:
+            return True
+        if path.startswith(directory + os.sep) and executable.startswith(path + os.sep):
+            return True
+
+    return False
+
+def get_game_instances(stop_event: Optional[threading.Event] = None) -> List[GWLocalGame]:
+    '''
+    blocking, should be called from the executor
+    '''
     if platform.system() == 'Darwin':
         return get_game_instances_macos()
     else:
-        return get_game_instances_windows()
+        return get_game_instances_windows(stop_event)
+
+
+def is_game_running(instances: List[GWLocalGame]) -> bool:
+    '''
+    blocking, should be called from the executor
+    '''
+    target_exes = [instance.exe_name().lower() for instance in instances]
+    if not target_exes:
+        return False
+
+    for proc_info in process_iter():
+        if proc_info.binary_path is None:
+            continue
+        if os.path.basename(proc_info.binary_path).lower() in target_exes:
+            return True
+
+    return False
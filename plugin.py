@@ -4,6 +4,7 @@
 import asyncio
 import logging
 import json
+import math
 import os
 import platform
 import sys
@@ -20,7 +21,7 @@ def get_platform() -> str:
     if system == 'Darwin':
         return 'macos'
 
-    logging.error('plugin/get_platform: unknown platform %s' % system)
+    logging.error('plugin/get_platform: unknown platform %s', system)
     return 'unknown'
 
 #expand sys.path
@@ -38,11 +39,23 @@ import urllib3
 logging.getLogger("urllib3").propagate = False
 
 #start sentry
+crashreport_transport = None
 try:
+    import certifi
+    import ssl
     import sentry_sdk
+    import common.mglx_sentry
+    sentry_dsn = "https://801708b080aa4699beb708e5ac909cc9@sentry.friends-of-friends-of-galaxy.org/3"
+    crashreport_transport = common.mglx_sentry.MglxSentryTransport(
+        sentry_dsn,
+        "galaxy-integration-gw2/%s" % manifest['version'],
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "crashreports.spool"),
+        ssl_context=ssl.create_default_context(cafile=certifi.where()))
     sentry_sdk.init(
-        "https://801708b080aa4699beb708e5ac909cc9@sentry.friends-of-friends-of-galaxy.org/3",
-        release=("galaxy-integration-gw2@%s" % manifest['version']))
+        sentry_dsn,
+        release=("galaxy-integration-gw2@%s" % manifest['version']),
+        transport=crashreport_transport,
+        before_send=common.mglx_sentry.MglxSentryFilter())
 except Exception:
     logging.exception('plugin/bootstrap: failed to initialize sentry')
 
@@ -50,12 +63,23 @@ from galaxy.api.consts import OSCompatibility, Platform, LicenseType, LocalGameS
 from galaxy.api.errors import BackendError, InvalidCredentials
 from galaxy.api.plugin import Plugin, create_and_run_plugin
 from galaxy.api.types import Achievement, Authentication, NextStep, Dlc, LicenseInfo, Game, GameTime, LocalGame
-from galaxy.proc_tools import process_iter
+
+import common.mglx_cache
+import common.mglx_executor
+import common.mglx_lifecycle
+import common.mglx_logging
+import common.mglx_watchdog
+import common.mglx_watcher
 
 import gw2.gw2_api
 import gw2.gw2_authserver
 import gw2.gw2_localgame
 
+#route plugin loggers through the rate limiter and the crash ring buffer
+common.mglx_logging.install([
+    'plugin', 'gw2_api', 'gw2_local_game',
+    'mglx_cache', 'mglx_executor', 'mglx_http', 'mglx_http_replay', 'mglx_lifecycle', 'mglx_watchdog', 'mglx_watcher', 'mglx_webserver'])
+
 class GuildWars2Plugin(Plugin):
     """
     Guild Wars 2 Plugin for GOG Galaxy
@@ -84,20 +108,37 @@ class GuildWars2Plugin(Plugin):
     #constants
     GAME_ID = 'guild_wars_2'
     GAME_NAME = 'Guild Wars 2'
+    SLEEP_CHECK_ACCOUNT = 600
     SLEEP_CHECK_ACHIEVEMENTS = 1500
     SLEEP_CHECK_INSTANCES = 60
     SLEEP_CHECK_RUNNING = 5
-    SLEEP_CHECK_RUNNING_ITER = 0.01
+    EXECUTOR_MAX_WORKERS = 2
+    EXECUTOR_MAX_QUEUE = 8
+    CACHE_PUSH_DEBOUNCE = 10
+    CACHE_PUSH_MAX_STALENESS = 300
+    WATCHER_DEBOUNCE = 2
+    LOOP_WATCHDOG_ENV = 'GW2_LOOP_WATCHDOG'
+    LOOP_WATCHDOG_THRESHOLD_ENV = 'GW2_LOOP_WATCHDOG_THRESHOLD'
+    HTTP_RECORD_ENV = 'GW2_HTTP_RECORD'
+    CRASHREPORT_FLUSH_TIMEOUT = 2
+    SHUTDOWN_TIMEOUT = 5
 
 
     def __init__(self, reader, writer, token):
         super().__init__(Platform(manifest['platform']), manifest['version'], reader, writer, token)
 
         self.__logger = logging.getLogger('plugin')
+        self.__lifecycle = common.mglx_lifecycle.MglxLifecycle()
+        self.__authserver = None
 
-        self._gw2_api = gw2.gw2_api.GW2API(manifest['version'])
+        self._gw2_api = gw2.gw2_api.GW2API(manifest['version'], record_path = os.environ.get(self.HTTP_RECORD_ENV))
+        self._executor = common.mglx_executor.MglxExecutor(self.EXECUTOR_MAX_WORKERS, self.EXECUTOR_MAX_QUEUE)
+        self._cache = common.mglx_cache.MglxCacheManager(lambda: self.persistent_cache, self.push_cache, self.CACHE_PUSH_DEBOUNCE, self.CACHE_PUSH_MAX_STALENESS)
         self._game_instances = None
+        self.__local_size = None
+        self.__watcher = common.mglx_watcher.MglxWatcher(self.__on_filesystem_changed, self.WATCHER_DEBOUNCE, gw2.gw2_localgame.is_relevant_path, self._executor)
 
+        self.__task_check_for_account = None
         self.__task_check_for_achievements = None
         self.__task_check_for_instances = None
         self._task_check_for_running  = None
@@ -107,6 +148,16 @@ class GuildWars2Plugin(Plugin):
 
         self.__platform = get_platform()
 
+        self.__watchdog = self.__create_watchdog()
+        if self.__watchdog is not None:
+            self.__lifecycle.register_resource('watchdog', self.__shutdown_watchdog)
+
+        self.__lifecycle.register_resource('watcher', self.__watcher.shutdown)
+        self.__lifecycle.register_resource('cache', self._cache.shutdown)
+        self.__lifecycle.register_resource('gw2_api', self._gw2_api.shutdown)
+        self.__lifecycle.register_resource('crashreport', self.__shutdown_crashreport)
+        self.__lifecycle.register_resource('executor', self.__shutdown_executor, required=True)
+
         self.__achievements_db = None
         try:
             with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "gw2/db/achievements.json"), mode="r", encoding="utf-8") as f:
@@ -114,6 +165,17 @@ class GuildWars2Plugin(Plugin):
         except Exception:
             self.__logger.exception('__init__: failed to read achievements info DB')
 
+        self.__dlcs_db = None
+        try:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "gw2/db/dlcs.json"), mode="r", encoding="utf-8") as f:
+                self.__dlcs_db = json.load(f)
+        except Exception:
+            self.__logger.exception('__init__: failed to read DLCs info DB')
+
+        self.__dlcs = dict()
+        self.__owned_game = None
+        self.__owned_game_access = None
+
     #
     # Authentication
     #
@@ -130,6 +192,7 @@ class GuildWars2Plugin(Plugin):
 
         #new auth
         self.__authserver = gw2.gw2_authserver.Gw2AuthServer(self._gw2_api)
+        self.__lifecycle.register_resource('authserver', self.__authserver.shutdown)
         self.__logger.info('authenticate: no stored credentials')
 
         AUTH_PARAMS = {
@@ -148,6 +211,8 @@ class GuildWars2Plugin(Plugin):
     async def pass_login_credentials(self, step, credentials, cookies):
         if self.__authserver is not None:
             await self.__authserver.shutdown()
+            self.__lifecycle.unregister_resource('authserver')
+            self.__authserver = None
 
         api_key = self._gw2_api.get_api_key()
         account_id = self._gw2_api.get_account_id()
@@ -164,37 +229,49 @@ class GuildWars2Plugin(Plugin):
     #
 
     async def get_owned_games(self):
+        return [ self.__get_owned_game() ]
+
+    def __get_owned_game(self) -> Game:
+        access = tuple(self._gw2_api.get_owned_games())
+        if self.__owned_game is not None and self.__owned_game_access == access:
+            return self.__owned_game
+
         free_to_play = False
-        
+
         dlcs = list()
-        for dlc in self._gw2_api.get_owned_games():
-            if dlc == 'PlayForFree':
+        for dlc_id in access:
+            if dlc_id == 'PlayForFree':
                 free_to_play = True
                 continue
-            if dlc == 'GuildWars2':
+            if dlc_id == 'GuildWars2':
                 continue
 
-            dlc_id = dlc
-            dlc_name = dlc
-            if dlc_id == 'HeartOfThorns':
-                dlc_name = 'Heart of Thorns'
-            elif dlc_id == 'PathOfFire':
-                dlc_name = 'Path of Fire'
-
-            dlcs.append(Dlc(dlc_id = dlc_id, dlc_title = dlc_name, license_info = LicenseInfo(license_type = LicenseType.SinglePurchase)))
+            dlcs.append(self.__get_dlc(dlc_id))
 
         license_type = LicenseType.SinglePurchase
         if free_to_play:
             license_type = LicenseType.FreeToPlay
 
-        return [ Game(game_id = self.GAME_ID, game_title = self.GAME_NAME, dlcs = dlcs, license_info = LicenseInfo(license_type = license_type)) ]
+        self.__owned_game = Game(game_id = self.GAME_ID, game_title = self.GAME_NAME, dlcs = dlcs, license_info = LicenseInfo(license_type = license_type))
+        self.__owned_game_access = access
+        return self.__owned_game
+
+    def __get_dlc(self, dlc_id: str) -> Dlc:
+        if dlc_id not in self.__dlcs:
+            dlc_name = dlc_id
+            if self.__dlcs_db and dlc_id in self.__dlcs_db:
+                dlc_name = self.__dlcs_db[dlc_id]
+
+            self.__dlcs[dlc_id] = Dlc(dlc_id = dlc_id, dlc_title = dlc_name, license_info = LicenseInfo(license_type = LicenseType.SinglePurchase))
+
+        return self.__dlcs[dlc_id]
 
     #
     # ImportInstalledGames
     #
 
     async def get_local_games(self):
-        self._game_instances = gw2.gw2_localgame.get_game_instances()
+        await self.__update_game_instances()
         if len(self._game_instances) == 0:
             self._last_state = LocalGameState.None_
             return []
@@ -208,11 +285,11 @@ class GuildWars2Plugin(Plugin):
 
     async def launch_game(self, game_id):
         if game_id != self.GAME_ID:
-            logging.warn('plugin/launch_game: unknown game_id %s' % game_id)
+            logging.warning('plugin/launch_game: unknown game_id %s', game_id)
             return
         
         try:
-            self._game_instances[0].run_game()
+            await self._executor.run('run_game', self._game_instances[0].run_game)
         except FileNotFoundError:
             logging.warning('plugin/launch_game: game executable is not found')
             self.update_local_game_status(LocalGame(game_id, LocalGameState.None_))
@@ -223,9 +300,9 @@ class GuildWars2Plugin(Plugin):
 
     async def install_game(self, game_id):
         if game_id != self.GAME_ID:
-            logging.warn('plugin/install_game: unknown game_id %s' % game_id)
+            logging.warning('plugin/install_game: unknown game_id %s', game_id)
             return
-        webbrowser.open('https://account.arena.net/welcome')
+        await self._executor.run('open_browser', webbrowser.open, 'https://account.arena.net/welcome')
 
     #
     # UninstallGame
@@ -233,10 +310,10 @@ class GuildWars2Plugin(Plugin):
 
     async def uninstall_game(self, game_id):
         if game_id != self.GAME_ID:
-            logging.warn('plugin/uninstall_game: unknown game_id %s' % game_id)
+            logging.warning('plugin/uninstall_game: unknown game_id %s', game_id)
             return
         try:
-            self._game_instances[0].uninstall_game()
+            await self._executor.run('uninstall_game', self._game_instances[0].uninstall_game)
         except FileNotFoundError:
             logging.warning('plugin/uninstall_game: game executable is not found')
             self.update_local_game_status(LocalGame(game_id, LocalGameState.None_))
@@ -245,13 +322,21 @@ class GuildWars2Plugin(Plugin):
     # ImportGameTime
     #
 
+    async def prepare_game_times_context(self, game_ids: List[str]) -> Any:
+        if self.GAME_ID not in game_ids:
+            return None
+
+        await self.__refresh_account_info()
+        return self._gw2_api.get_account_age()
+
     async def get_game_time(self, game_id, context):
         if game_id != self.GAME_ID:
-            logging.warn('plugin/get_game_time: unknown game_id %s' % game_id)
+            logging.warning('plugin/get_game_time: unknown game_id %s', game_id)
             return None
 
-        time_played = int(self._gw2_api.get_account_age() / 60)
-        last_played_time = self.persistent_cache.get('last_played')
+        account_age = context if context is not None else self._gw2_api.get_account_age()
+        time_played = int((account_age or 0) / 60)
+        last_played_time = self._cache.get('last_played')
 
         return GameTime(game_id = game_id, time_played = time_played, last_played_time = last_played_time)
 
@@ -261,7 +346,7 @@ class GuildWars2Plugin(Plugin):
 
     async def get_os_compatibility(self, game_id: str, context: Any) -> Optional[OSCompatibility]:      
         if game_id != self.GAME_ID:
-            logging.warn('plugin/get_game_time: unknown game_id %s' % game_id)
+            logging.warning('plugin/get_game_time: unknown game_id %s', game_id)
             return None
 
         return OSCompatibility.Windows | OSCompatibility.MacOS
@@ -270,31 +355,40 @@ class GuildWars2Plugin(Plugin):
     # ImportAchievements
     #
 
+    async def prepare_achievements_context(self, game_ids: List[str]) -> Any:
+        if self.GAME_ID not in game_ids:
+            return None
+
+        return await self._gw2_api.get_account_achievements()
+
     async def get_unlocked_achievements(self, game_id: str, context: Any) -> List[Achievement]:
         result = list()
 
         if game_id != self.GAME_ID:
-            logging.warn('plugin/get_unlocked_achievements: unknown game_id %s' % game_id)
+            logging.warning('plugin/get_unlocked_achievements: unknown game_id %s', game_id)
             return result
 
         if not self.__imported_achievements:
             self.__imported_achievements = list()
 
+        account_achievements = context
+        if account_achievements is None:
+            account_achievements = await self._gw2_api.get_account_achievements()
+
         self.__imported_achievements.clear()
-        for achievement_id in await self._gw2_api.get_account_achievements():
+        for achievement_id in account_achievements:
             #check for existence    
             if not self.__is_achievement_exists(achievement_id):
                 continue
 
             #save unlock time
             cache_key = 'achievement_%s' % achievement_id
-            if cache_key not in self.persistent_cache:
-                self.persistent_cache[cache_key] = int(time.time())
+            if cache_key not in self._cache:
+                self._cache[cache_key] = int(time.time())
 
             #append to list
-            result.append(Achievement(self.persistent_cache.get(cache_key), achievement_id, self.__get_achievement_name(achievement_id)))
+            result.append(Achievement(self._cache.get(cache_key), achievement_id, self.__get_achievement_name(achievement_id)))
 
-        self.push_cache()
         return result
 
     def __is_achievement_exists(self, achievement_id: int) -> bool:
@@ -316,37 +410,134 @@ class GuildWars2Plugin(Plugin):
     # ImportLocalSize
     #
 
+    async def prepare_local_size_context(self, game_ids: List[str]) -> Any:
+        if self.GAME_ID not in game_ids:
+            return None
+
+        return await self.__get_local_size()
+
     async def get_local_size(self, game_id: str, context: Any) -> Optional[int]:   
         if game_id != self.GAME_ID:
-            logging.warn('plugin/get_local_size: unknown game_id %s' % game_id)
+            logging.warning('plugin/get_local_size: unknown game_id %s', game_id)
             return None
 
+        if context is not None:
+            return context
+
+        return await self.__get_local_size()
+
+    async def __get_local_size(self) -> Optional[int]:
         if not self._game_instances:
             return None
 
-        return await self._game_instances[0].get_app_size()
+        if self.__local_size is None:
+            instance = self._game_instances[0]
+            self.__local_size = await self._executor.run('get_app_size', instance.get_app_size, self.__lifecycle.get_stop_event(), key = ('get_app_size', instance.directory()))
+
+        return self.__local_size
 
     #
     # Other
     #
 
+    def handshake_complete(self) -> None:
+        if self.__watchdog is not None:
+            self.__watchdog.start()
+
     def tick(self):
+        if self.__lifecycle.is_stopped():
+            return
+
         if not self._task_check_for_running or self._task_check_for_running.done():
-            self._task_check_for_running = self.create_task(self.task_check_for_running_func(), "task_check_for_running_game")
+            self._task_check_for_running = self.__create_task(self.task_check_for_running_func(), "task_check_for_running_game")
 
         if not self.__task_check_for_instances or self.__task_check_for_instances.done():
-            self.__task_check_for_instances = self.create_task(self.task_check_for_game_instances(), "task_check_for_instances")
+            self.__task_check_for_instances = self.__create_task(self.task_check_for_game_instances(), "task_check_for_instances")
+
+        if not self.__task_check_for_account or self.__task_check_for_account.done():
+            self.__task_check_for_account = self.__create_task(self.task_check_for_account(), "task_check_for_account")
 
         if not self.__task_check_for_achievements or self.__task_check_for_achievements.done():
-            self.__task_check_for_achievements = self.create_task(self.task_check_for_achievements(), "task_check_for_achievements")
+            self.__task_check_for_achievements = self.__create_task(self.task_check_for_achievements(), "task_check_for_achievements")
 
     async def shutdown(self) -> None:
-        await self._gw2_api.shutdown()
+        await self.__lifecycle.shutdown(self.SHUTDOWN_TIMEOUT)
+
+    def __create_task(self, coro, description):
+        return self.__lifecycle.register_task(self.create_task(coro, description), description)
+
+    def __create_watchdog(self):
+        if os.environ.get(self.LOOP_WATCHDOG_ENV, '0') in ('', '0'):
+            return None
+
+        watchdog_class = common.mglx_watchdog.MglxLoopWatchdog
+        threshold = watchdog_class.WATCHDOG_DEFAULT_THRESHOLD
+        threshold_str = os.environ.get(self.LOOP_WATCHDOG_THRESHOLD_ENV)
+        if threshold_str:
+            try:
+                threshold = float(threshold_str)
+            except ValueError:
+                threshold = None
+
+            if threshold is None or not math.isfinite(threshold) or threshold <= watchdog_class.WATCHDOG_DEFAULT_INTERVAL:
+                self.__logger.warning('__create_watchdog: invalid threshold %s, must be greater than %s s, using default %s s',
+                    threshold_str, watchdog_class.WATCHDOG_DEFAULT_INTERVAL, watchdog_class.WATCHDOG_DEFAULT_THRESHOLD)
+                threshold = watchdog_class.WATCHDOG_DEFAULT_THRESHOLD
+
+        return watchdog_class(threshold)
+
+    async def __shutdown_watchdog(self):
+        self.__logger.info('shutdown: event loop stats %s', self.__watchdog.get_stats())
+        await self.__watchdog.shutdown()
+
+    async def __shutdown_crashreport(self):
+        if crashreport_transport is None:
+            return
+
+        #own thread, the executor may be busy with jobs which are still stopping
+        await crashreport_transport.shutdown(self.CRASHREPORT_FLUSH_TIMEOUT)
+
+    async def __shutdown_executor(self):
+        self.__logger.info('shutdown: executor stats %s', self._executor.get_stats())
+        await self._executor.shutdown()
 
     #
     # Internals
     #
 
+    async def task_check_for_account(self):
+        await asyncio.sleep(self.SLEEP_CHECK_ACCOUNT)
+        await self.__refresh_account_info()
+
+    async def __refresh_account_info(self):
+        if not await self._gw2_api.refresh_account_info():
+            return
+
+        #galaxy has not imported owned games yet
+        if self.__owned_game is None:
+            return
+
+        previous_access = self.__owned_game_access
+        game = self.__get_owned_game()
+        self.__logger.info('__refresh_account_info: owned games changed %s -> %s', previous_access, self.__owned_game_access)
+        self.update_game(game)
+
+    async def __update_game_instances(self):
+        self._game_instances = await self._executor.run('get_game_instances', gw2.gw2_localgame.get_game_instances, self.__lifecycle.get_stop_event(), key = 'get_game_instances')
+        self.__local_size = None
+
+    async def __on_filesystem_changed(self, paths):
+        instances = self._game_instances or []
+        if not any(gw2.gw2_localgame.is_instances_path(path, instances) for path in paths):
+            #files inside the install directory were written, only the size is affected
+            self.__logger.debug('__on_filesystem_changed: size changed, %s', sorted(paths))
+            self.__local_size = None
+            return
+
+        self.__logger.info('__on_filesystem_changed: %s', sorted(paths))
+        await self.__update_game_instances()
+        await self.__watcher.set_paths(gw2.gw2_localgame.get_watch_paths(self._game_instances))
+
     async def task_check_for_achievements(self):
         if self.__imported_achievements:
             for achievement_id in self._gw2_api.get_account_achievements():
@@ -360,16 +551,20 @@ class GuildWars2Plugin(Plugin):
                     
                     #save unlock time
                     cache_key = 'achievement_%s' % achievement_id
-                    self.persistent_cache[cache_key] = int(time.time())
+                    self._cache[cache_key] = int(time.time())
 
                     #push to galaxy
-                    self.unlock_achievement(self.GAME_ID, Achievement(self.persistent_cache.get(cache_key), achievement_id, self.__get_achievement_name(achievement_id)))
+                    self.unlock_achievement(self.GAME_ID, Achievement(self._cache.get(cache_key), achievement_id, self.__get_achievement_name(achievement_id)))
 
         await asyncio.sleep(self.SLEEP_CHECK_ACHIEVEMENTS)
 
 
     async def task_check_for_game_instances(self):
-        self._game_instances = gw2.gw2_localgame.get_game_instances()
+        #instances are updated by the filesystem watcher, rescan only if it is not available
+        if not self.__watcher.is_started():
+            await self.__update_game_instances()
+            await self.__watcher.start(gw2.gw2_localgame.get_watch_paths(self._game_instances))
+
         await asyncio.sleep(self.SLEEP_CHECK_INSTANCES)
 
 
@@ -380,29 +575,18 @@ class GuildWars2Plugin(Plugin):
             await asyncio.sleep(self.SLEEP_CHECK_RUNNING)
             return
 
-        #get exe names
-        target_exes = list()
-        for instance in self._game_instances:
-            target_exes.append(instance.exe_name().lower())
-
         #check processes
+        instances = list(self._game_instances or [])
         running = False
-        if target_exes:    
-            for proc_info in process_iter():
-                if proc_info.binary_path is None:
-                    continue
-                if os.path.basename(proc_info.binary_path).lower() in target_exes:
-                    running = True
-                    break
-                await asyncio.sleep(self.SLEEP_CHECK_RUNNING_ITER)
+        if instances:
+            running = await self._executor.run('is_game_running', gw2.gw2_localgame.is_game_running, instances, key = 'is_game_running')
 
         #update state
         new_state = None
         if running:
-            self.persistent_cache['last_played'] = int(time.time())
-            self.push_cache()
+            self._cache['last_played'] = int(time.time())
             new_state = LocalGameState.Installed | LocalGameState.Running
-        elif target_exes:
+        elif instances:
             new_state = LocalGameState.Installed
         else:
             new_state = LocalGameState.None_
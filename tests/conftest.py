@@ -0,0 +1,22 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def plugin_module():
+    #keep errors logged by the tests out of the production crash reports
+    import sentry_sdk
+    init = sentry_sdk.init
+    sentry_sdk.init = lambda *args, **kwargs: None
+    try:
+        import plugin
+    finally:
+        sentry_sdk.init = init
+    return plugin
@@ -0,0 +1,51 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import os
+
+import pytest
+
+import gw2.gw2_localgame
+from gw2.gw2_localgame import GWLocalGame, is_instances_path, is_relevant_path
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    config_dir = str(tmp_path / 'appdata' / 'guild wars 2')
+    game_dir = str(tmp_path / 'games' / 'guild wars 2')
+    monkeypatch.setattr(gw2.gw2_localgame.platform, 'system', lambda: 'Windows')
+    monkeypatch.setattr(gw2.gw2_localgame, 'get_config_dir_windows', lambda: config_dir + os.sep)
+    return config_dir, game_dir, [GWLocalGame(game_dir, 'gw2-64.exe')]
+
+
+def test_config_files(dirs):
+    config_dir, _, instances = dirs
+
+    assert is_instances_path(config_dir, instances)
+    assert is_instances_path(os.path.join(config_dir, 'GFXSettings.Gw2-64.exe.xml'), instances)
+
+    assert not is_relevant_path(os.path.join(config_dir, 'Local.dat'))
+    assert not is_instances_path(os.path.join(config_dir, 'Local.dat'), instances)
+
+
+def test_install_directory(dirs):
+    _, game_dir, instances = dirs
+
+    for path in (game_dir, os.path.join(game_dir, 'Gw2-64.exe')):
+        assert is_relevant_path(path)
+        assert is_instances_path(path, instances)
+
+    #writes of the game data change only the size
+    for path in (os.path.join(game_dir, 'Gw2.dat'), os.path.join(game_dir, 'bin64', 'CoherentUI_Host.exe')):
+        assert is_relevant_path(path)
+        assert not is_instances_path(path, instances)
+
+
+def test_macos_bundle(monkeypatch):
+    monkeypatch.setattr(gw2.gw2_localgame.platform, 'system', lambda: 'Darwin')
+    location = gw2.gw2_localgame.MACOS_GAME_LOCATION
+
+    assert is_instances_path(location, [])
+    assert is_instances_path(os.path.join(location, 'Contents'), [])
+    assert is_instances_path(os.path.join(location, gw2.gw2_localgame.MACOS_GAME_EXECUTABLE), [])
+    assert not is_instances_path(os.path.join(location, 'Contents', 'Resources', 'Gw2.dat'), [])
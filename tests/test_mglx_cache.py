@@ -0,0 +1,67 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import time
+
+from common.mglx_cache import MglxCacheManager
+
+#scaled down: 1 ms of test time is 5 s of a real session, debounce is kept well above timer jitter
+TICK = 0.001
+DEBOUNCE = 0.01
+MAX_STALENESS = 0.06
+SESSION_TICKS = 1440
+
+
+def create_cache():
+    cache = dict()
+    pushes = list()
+    manager = MglxCacheManager(lambda: cache, lambda: pushes.append(dict(cache)), DEBOUNCE, MAX_STALENESS)
+    return cache, pushes, manager
+
+
+def test_two_hours_session_pushes_are_bounded_by_staleness():
+    async def session():
+        cache, pushes, manager = create_cache()
+
+        start = time.monotonic()
+        for tick in range(SESSION_TICKS):
+            manager['last_played'] = tick
+            await asyncio.sleep(TICK)
+        elapsed = time.monotonic() - start
+
+        await manager.shutdown()
+        return cache, pushes, manager, elapsed
+
+    cache, pushes, manager, elapsed = asyncio.run(session())
+
+    assert not manager.is_dirty()
+    assert pushes[-1] == cache
+    assert 1 < manager.get_push_count() <= elapsed / MAX_STALENESS + 2
+    assert manager.get_push_count() < SESSION_TICKS / 10
+
+
+def test_unchanged_values_are_not_pushed():
+    async def session():
+        cache, pushes, manager = create_cache()
+        manager['achievement_1'] = 1
+        await asyncio.sleep(DEBOUNCE * 5)
+        for _ in range(10):
+            manager['achievement_1'] = 1
+        await asyncio.sleep(DEBOUNCE * 5)
+        return manager
+
+    assert asyncio.run(session()).get_push_count() == 1
+
+
+def test_burst_is_coalesced_into_one_push():
+    async def session():
+        cache, pushes, manager = create_cache()
+        for i in range(100):
+            manager['achievement_%s' % i] = i
+        await asyncio.sleep(DEBOUNCE * 5)
+        return pushes
+
+    pushes = asyncio.run(session())
+    assert len(pushes) == 1
+    assert len(pushes[0]) == 100
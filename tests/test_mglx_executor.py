@@ -0,0 +1,147 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from common.mglx_executor import MglxExecutor
+from gw2.gw2_localgame import GWLocalGame
+
+RPC_INTERVAL = 0.005
+RPC_MAX_LAG = 0.1
+
+
+def create_tree(root, dirs: int = 50, files: int = 100):
+    for i in range(dirs):
+        directory = os.path.join(str(root), 'dir_%s' % i)
+        os.makedirs(directory)
+        for j in range(files):
+            with open(os.path.join(directory, 'file_%s' % j), 'wb') as f:
+                f.write(b'x' * j)
+
+
+async def measure_rpc_lag(stop: asyncio.Event) -> float:
+    loop = asyncio.get_event_loop()
+    lag_max = 0.0
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(RPC_INTERVAL)
+        lag_max = max(lag_max, loop.time() - started - RPC_INTERVAL)
+    return lag_max
+
+
+def test_rpc_latency_stays_flat_during_scan(tmp_path):
+    create_tree(tmp_path)
+    game = GWLocalGame(str(tmp_path), 'Gw2-64.exe')
+
+    async def session():
+        executor = MglxExecutor(2, 8)
+        stop = asyncio.Event()
+        lag_task = asyncio.get_event_loop().create_task(measure_rpc_lag(stop))
+
+        sizes = await asyncio.gather(*[executor.run('get_app_size', game.get_app_size, key=('get_app_size', i)) for i in range(10)])
+
+        stop.set()
+        lag_max = await lag_task
+        await executor.shutdown()
+        return sizes, lag_max, executor.get_stats()
+
+    sizes, lag_max, stats = asyncio.run(session())
+
+    assert sizes == [50 * sum(range(100))] * 10
+    assert stats['jobs']['get_app_size']['count'] == 10
+    assert lag_max < RPC_MAX_LAG
+
+
+def test_jobs_with_same_key_are_deduplicated():
+    calls = list()
+    release = threading.Event()
+
+    def job(value):
+        calls.append(value)
+        release.wait(5)
+        return value
+
+    async def session():
+        executor = MglxExecutor(2, 8)
+        first = asyncio.ensure_future(executor.run('job', job, 1, key='job'))
+        second = asyncio.ensure_future(executor.run('job', job, 2, key='job'))
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(first, second)
+        third = await executor.run('job', job, 3, key='job')
+        await executor.shutdown()
+        return results, third, executor.get_stats()
+
+    results, third, stats = asyncio.run(session())
+
+    assert results == [1, 1]
+    assert third == 3
+    assert calls == [1, 3]
+    assert stats['deduplicated'] == 1
+
+
+def test_cancelled_caller_does_not_cancel_shared_job():
+    release = threading.Event()
+
+    async def session():
+        executor = MglxExecutor(1, 1)
+        first = asyncio.ensure_future(executor.run('job', release.wait, 5, key='job'))
+        second = asyncio.ensure_future(executor.run('job', release.wait, 5, key='job'))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        result = await second
+        await executor.shutdown()
+        return first, result
+
+    first, result = asyncio.run(session())
+
+    assert first.cancelled()
+    assert result is True
+
+
+def test_queue_is_bounded():
+    release = threading.Event()
+
+    async def session():
+        executor = MglxExecutor(1, 1)
+        jobs = [asyncio.ensure_future(executor.run('job', release.wait, 5)) for _ in range(6)]
+        await asyncio.sleep(0.05)
+        stats_blocked = executor.get_stats()
+        release.set()
+        results = await asyncio.gather(*jobs)
+        await executor.shutdown()
+        return stats_blocked, results, executor.get_stats()
+
+    stats_blocked, results, stats = asyncio.run(session())
+
+    assert stats_blocked['running'] == 1
+    assert stats_blocked['queued'] == 1
+    assert stats_blocked['waiting'] == 4
+    assert results == [True] * 6
+    assert stats['queued_max'] <= 2
+    assert stats['jobs']['job']['count'] == 6
+
+
+def test_exceptions_are_propagated():
+    def job():
+        raise ValueError('job failed')
+
+    async def session():
+        executor = MglxExecutor(1, 1)
+        try:
+            with pytest.raises(ValueError, match='job failed'):
+                await executor.run('job', job, key='job')
+            return await executor.run('sum', sum, [1, 2, 3]), executor.get_stats()
+        finally:
+            await executor.shutdown()
+
+    result, stats = asyncio.run(session())
+
+    assert result == 6
+    assert stats['jobs']['job'] == dict(stats['jobs']['job'], count=1, errors=1)
@@ -0,0 +1,39 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+
+import aiohttp.web
+
+from common.mglx_http import MglxHttp
+
+
+def test_cancellation_reaches_caller():
+    async def session():
+        release = asyncio.Event()
+
+        async def handler(request):
+            await release.wait()
+            return aiohttp.web.json_response({})
+
+        app = aiohttp.web.Application()
+        app.router.add_get('/v2/account', handler)
+        runner = aiohttp.web.AppRunner(app)
+        await runner.setup()
+        site = aiohttp.web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+
+        http = MglxHttp()
+        try:
+            task = asyncio.get_event_loop().create_task(http.request_json('GET', 'http://127.0.0.1:%s/v2/account' % port))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.wait([task])
+            return task.cancelled()
+        finally:
+            release.set()
+            await http.shutdown()
+            await runner.cleanup()
+
+    assert asyncio.run(session())
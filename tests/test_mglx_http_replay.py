@@ -0,0 +1,113 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import json
+import time
+
+import aiohttp.web
+from multidict import CIMultiDict
+
+from common.mglx_http_replay import MglxHttpRecorder, MglxHttpReplay
+from gw2.gw2_api import GW2API
+from gw2.gw2_constants import GW2AuthorizationResult
+
+
+def test_recorded_headers_keep_case_insensitive_lookup(tmp_path):
+    path = str(tmp_path / 'fixture.json.gz')
+
+    recorder = MglxHttpRecorder(path)
+    recorder.record('GET', 'https://api.guildwars2.com/v2/account', None, 200, CIMultiDict({'etag': '"1"'}), '{"access":[]}', 0.1)
+    recorder.save()
+
+    async def replay():
+        return await MglxHttpReplay(path).request_json('GET', 'https://api.guildwars2.com/v2/account')
+
+    response = asyncio.run(replay())
+    assert response.status == 200
+    assert response.json == {'access': []}
+    assert 'ETag' in response.headers
+    assert response.headers['ETag'] == '"1"'
+
+
+def test_responses_are_replayed_in_recorded_order(tmp_path):
+    path = str(tmp_path / 'fixture.json')
+
+    recorder = MglxHttpRecorder(path)
+    for access in (['GuildWars2'], ['GuildWars2', 'HeartOfThorns']):
+        recorder.record('GET', 'https://api.guildwars2.com/v2/account', None, 200, {}, json.dumps({'access': access}), 0.1)
+
+    async def replay():
+        http = MglxHttpReplay(path)
+        return [(await http.request_json('GET', 'https://api.guildwars2.com/v2/account')).json['access'] for _ in range(3)]
+
+    #recorded incrementally, save() was not called
+    assert asyncio.run(replay()) == [['GuildWars2'], ['GuildWars2', 'HeartOfThorns'], ['GuildWars2', 'HeartOfThorns']]
+
+
+def test_fixture_cut_off_by_killed_process_is_usable(tmp_path):
+    path = str(tmp_path / 'fixture.json')
+
+    recorder = MglxHttpRecorder(path)
+    recorder.record('GET', 'https://api.guildwars2.com/v2/account', None, 200, {}, '{"access":[]}', 0.1)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"method":"GET","url":"https://api.guild')
+
+    async def replay():
+        http = MglxHttpReplay(path)
+        return await http.request_json('GET', 'https://api.guildwars2.com/v2/account'), await http.request_json('GET', 'https://api.guildwars2.com/v2/build')
+
+    found, missing = asyncio.run(replay())
+    assert found.json == {'access': []}
+    assert missing.status == 0
+
+
+def test_realtime_replay_reproduces_latency(tmp_path):
+    path = str(tmp_path / 'fixture.json')
+
+    recorder = MglxHttpRecorder(path)
+    recorder.record('GET', 'https://api.guildwars2.com/v2/account', None, 200, {}, '{}', 0.2)
+
+    async def replay(realtime):
+        http = MglxHttpReplay(path, realtime=realtime)
+        started = time.monotonic()
+        await http.request('GET', 'https://api.guildwars2.com/v2/account')
+        return time.monotonic() - started
+
+    assert asyncio.run(replay(True)) >= 0.2
+    assert asyncio.run(replay(False)) < 0.1
+
+
+def test_gw2api_records_with_tracer(tmp_path):
+    path = str(tmp_path / 'fixture.json.gz')
+
+    async def session():
+        async def handler(request):
+            return aiohttp.web.json_response({'id': 'account-id', 'name': 'Player.1234', 'access': ['GuildWars2']})
+
+        app = aiohttp.web.Application()
+        app.router.add_get('/v2/account', handler)
+        runner = aiohttp.web.AppRunner(app)
+        await runner.setup()
+        await aiohttp.web.TCPSite(runner, '127.0.0.1', 0).start()
+
+        api = GW2API('1.0', record_path=path)
+        api.API_DOMAIN = 'http://127.0.0.1:%s' % runner.addresses[0][1]
+        try:
+            result = await api.do_auth_apikey('api-key')
+        finally:
+            await api.shutdown()
+            await runner.cleanup()
+
+        replay = GW2API('1.0', http=MglxHttpReplay(path))
+        replay.API_DOMAIN = api.API_DOMAIN
+        replayed = await replay.do_auth_apikey('api-key')
+
+        return result, api.get_http_stats(), replayed, replay.get_account_name()
+
+    result, stats, replayed, name = asyncio.run(session())
+
+    assert result == GW2AuthorizationResult.FINISHED
+    assert stats['count'] == 1
+    assert replayed == GW2AuthorizationResult.FINISHED
+    assert name == 'Player.1234'
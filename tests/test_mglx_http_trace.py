@@ -0,0 +1,69 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+
+import aiohttp.web
+
+from common.mglx_http import MglxHttp
+from common.mglx_http_trace import MglxHttpTracer
+
+SERVER_DELAY = 0.1
+
+
+async def run_requests(tracer: MglxHttpTracer, count: int, closed_port: bool = False):
+    async def handler(request):
+        await asyncio.sleep(SERVER_DELAY)
+        return aiohttp.web.json_response({'id': 1})
+
+    app = aiohttp.web.Application()
+    app.router.add_get('/v2/build', handler)
+    runner = aiohttp.web.AppRunner(app)
+    await runner.setup()
+    await aiohttp.web.TCPSite(runner, '127.0.0.1', 0).start()
+    port = runner.addresses[0][1]
+
+    http = MglxHttp(tracer=tracer)
+    try:
+        for _ in range(count):
+            await http.request_json('GET', 'http://127.0.0.1:%s/v2/build' % port)
+        if closed_port:
+            await runner.cleanup()
+            await http.request_json('GET', 'http://127.0.0.1:%s/v2/build' % port)
+    finally:
+        await http.shutdown()
+        await runner.cleanup()
+
+
+def test_pool_miss_then_hit():
+    tracer = MglxHttpTracer()
+    asyncio.run(run_requests(tracer, 2))
+
+    first, second = tracer.get_records()
+    assert (first.reused, second.reused) == (False, True)
+    assert (first.status, second.status) == (200, 200)
+
+    #ttfb covers the server time only, connection setup is reported separately
+    for record in (first, second):
+        assert SERVER_DELAY <= record.ttfb <= record.total
+        assert record.queued + record.dns + record.connect + record.ttfb + record.download <= record.total + 0.001
+
+    stats = tracer.get_stats()
+    assert (stats['count'], stats['errors'], stats['pool_hits'], stats['pool_misses']) == (2, 0, 1, 1)
+
+
+def test_connection_errors_are_counted():
+    tracer = MglxHttpTracer()
+    asyncio.run(run_requests(tracer, 1, closed_port=True))
+
+    stats = tracer.get_stats()
+    assert (stats['count'], stats['errors']) == (2, 1)
+    assert tracer.get_records()[-1].status == 0
+
+
+def test_unsampled_requests_are_not_traced():
+    tracer = MglxHttpTracer(sample_rate=0)
+    asyncio.run(run_requests(tracer, 2))
+
+    assert tracer.get_records() == []
+    assert tracer.get_stats()['count'] == 0
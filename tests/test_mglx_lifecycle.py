@@ -0,0 +1,95 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import os
+import threading
+import time
+
+from common.mglx_executor import MglxExecutor
+from common.mglx_lifecycle import MglxLifecycle
+from common.mglx_sentry import MglxSentryTransport
+from gw2.gw2_localgame import GWLocalGame
+
+#nothing listens on the port, delivery fails immediately
+UNREACHABLE_DSN = 'http://key@127.0.0.1:9/1'
+
+
+def create_tree(root, dirs: int = 20, files: int = 20):
+    for i in range(dirs):
+        directory = os.path.join(str(root), 'dir_%s' % i)
+        os.makedirs(directory)
+        for j in range(files):
+            open(os.path.join(directory, 'file_%s' % j), 'wb').close()
+
+
+def test_shutdown_is_bounded_with_scans_in_flight(tmp_path, monkeypatch):
+    game_dir = tmp_path / 'Guild Wars 2'
+    create_tree(game_dir)
+    game = GWLocalGame(str(game_dir), 'Gw2-64.exe')
+
+    #400 files, a full scan takes 4 s
+    islink = os.path.islink
+    monkeypatch.setattr(os.path, 'islink', lambda path: time.sleep(0.01) or islink(path))
+
+    async def session():
+        lifecycle = MglxLifecycle()
+        executor = MglxExecutor(2, 8)
+
+        transport = MglxSentryTransport(UNREACHABLE_DSN, 'test/1.0', str(tmp_path / 'crashreports.spool'), interval=5, timeout=1)
+        transport({'event_id': 1})
+
+        lifecycle.register_resource('crashreport', lambda: transport.shutdown(1))
+        lifecycle.register_resource('executor', executor.shutdown, required=True)
+
+        loop = asyncio.get_event_loop()
+        for i in range(2):
+            scan = executor.run('get_app_size', game.get_app_size, lifecycle.get_stop_event(), key=('get_app_size', i))
+            lifecycle.register_task(loop.create_task(scan))
+        await asyncio.sleep(0.1)
+
+        started = time.monotonic()
+        failures = await lifecycle.shutdown(2)
+        return failures, time.monotonic() - started
+
+    failures, elapsed = asyncio.run(session())
+
+    assert failures == []
+    assert elapsed < 2
+
+    #running scans return early, interpreter exit does not wait for the pool threads
+    workers = [thread for thread in threading.enumerate() if thread.name.startswith('mglx_executor')]
+    for worker in workers:
+        worker.join(0.5)
+    assert not any(worker.is_alive() for worker in workers)
+
+
+def test_required_resource_is_closed_when_budget_is_used_up():
+    closed = list()
+
+    async def stubborn():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.6)
+
+    async def slow_close():
+        await asyncio.sleep(10)
+
+    async def required_close():
+        closed.append('executor')
+
+    async def session():
+        lifecycle = MglxLifecycle()
+        lifecycle.register_task(asyncio.get_event_loop().create_task(stubborn()), 'stubborn')
+        lifecycle.register_resource('slow', slow_close)
+        lifecycle.register_resource('optional', lambda: closed.append('optional'))
+        lifecycle.register_resource('executor', required_close, required=True)
+        await asyncio.sleep(0)
+        return await lifecycle.shutdown(1), lifecycle.get_stop_event().is_set()
+
+    failures, stop_event_set = asyncio.run(session())
+
+    assert failures == ['task stubborn: not stopped in time', 'resource slow: not closed in time', 'resource optional: no time left']
+    assert closed == ['executor']
+    assert stop_event_set
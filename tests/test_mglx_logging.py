@@ -0,0 +1,145 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import logging
+import time
+
+import pytest
+
+from common.mglx_logging import MglxRateLimitFilter, MglxTruncated, install
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super(ListHandler, self).__init__()
+        self.records = list()
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def messages(self):
+        return [record.getMessage() for record in self.records]
+
+
+@pytest.fixture
+def root_handler():
+    handler = ListHandler()
+    logging.getLogger().addHandler(handler)
+    yield handler
+    logging.getLogger().removeHandler(handler)
+
+
+def create_logger(name, **kwargs):
+    install([name], **kwargs)
+    logger = logging.getLogger(name)
+    yield logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    for log_filter in list(logger.filters):
+        logger.removeFilter(log_filter)
+
+
+@pytest.fixture
+def rate_limited_logger():
+    yield from create_logger('test_mglx_logging_rate_limit', rate_limit=MglxRateLimitFilter(window=0.05, burst=2))
+
+
+@pytest.fixture
+def buffered_logger():
+    yield from create_logger('test_mglx_logging_buffer', capacity=3)
+
+
+#
+# MglxRateLimitFilter
+#
+
+def test_rate_limit_suppresses_burst_and_reports_count(rate_limited_logger, root_handler):
+    #stands in for a crash reporter which sees the records before the forwarding handler
+    reporter = ListHandler()
+    rate_limited_logger.addHandler(reporter)
+
+    for status in range(5):
+        rate_limited_logger.warning('request: %s --> %s', '/v2/account', status)
+
+    time.sleep(0.06)
+    rate_limited_logger.warning('request: %s --> %s', '/v2/account', 5)
+
+    assert root_handler.messages() == [
+        'request: /v2/account --> 0',
+        'request: /v2/account --> 1',
+        'request: /v2/account --> 5 (3 similar messages suppressed)',
+    ]
+
+    #message template is left intact for grouping
+    assert [record.msg for record in reporter.records] == ['request: %s --> %s'] * 3
+    assert reporter.records[-1].getMessage() == 'request: /v2/account --> 5'
+    assert reporter.records[-1].suppressed == 3
+
+
+def test_rate_limit_groups_by_template(rate_limited_logger, root_handler):
+    for i in range(3):
+        rate_limited_logger.warning('first: %s', i)
+        rate_limited_logger.warning('second: %s', i)
+
+    assert root_handler.messages() == ['first: 0', 'second: 0', 'first: 1', 'second: 1']
+
+
+#
+# MglxRingBufferHandler
+#
+
+def test_ring_buffer_keeps_low_level_records(buffered_logger, root_handler):
+    for i in range(5):
+        buffered_logger.debug('debug: %s', i)
+    buffered_logger.info('info')
+    buffered_logger.warning('warning')
+
+    assert root_handler.messages() == ['info', 'warning']
+
+
+def test_ring_buffer_dumps_recent_records_on_error(buffered_logger, root_handler):
+    for i in range(5):
+        buffered_logger.debug('debug: %s', i)
+    buffered_logger.error('error')
+
+    assert root_handler.messages() == ['ring buffer: 3 recent records before the error', 'debug: 2', 'debug: 3', 'debug: 4', 'error']
+
+    #buffer is emptied by the dump
+    root_handler.records.clear()
+    buffered_logger.error('error')
+    assert root_handler.messages() == ['error']
+
+
+#
+# MglxTruncated
+#
+
+def test_truncated_str():
+    assert str(MglxTruncated('short')) == 'short'
+    assert str(MglxTruncated('a' * 10, limit=4)) == 'aaaa...(truncated)'
+    assert str(MglxTruncated(list(range(3)))) == '[0, 1, 2]'
+
+
+def test_truncated_bytes():
+    assert str(MglxTruncated(b'abc')) == 'abc'
+    assert str(MglxTruncated(b'a' * 10, limit=4)) == 'aaaa...(truncated)'
+    assert str(MglxTruncated(bytearray(b'abcdef'), limit=6)) == 'abcdef'
+
+    #only the bytes needed for the limit are decoded
+    assert str(MglxTruncated('abé'.encode('utf-8'), limit=3)) == 'abé'
+    assert str(MglxTruncated('abcdé'.encode('utf-8'), limit=4)) == 'abcd...(truncated)'
+
+
+def test_truncated_is_formatted_lazily():
+    class Value:
+        calls = 0
+
+        def __str__(self):
+            Value.calls += 1
+            return 'value'
+
+    logger = logging.getLogger('test_mglx_logging_lazy')
+    logger.setLevel(logging.INFO)
+    logger.debug('response: %s', MglxTruncated(Value()))
+
+    assert Value.calls == 0
@@ -0,0 +1,207 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+from common.mglx_sentry import MglxSentryFilter, MglxSentryTransport
+
+#nothing listens on the port, delivery fails immediately
+UNREACHABLE_DSN = 'http://key@127.0.0.1:9/1'
+
+
+class SentryServer(http.server.ThreadingHTTPServer):
+    '''
+    local store endpoint, answers with the configured status and collects delivered events
+    '''
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SentryHandler)
+        self.status = 200
+        self.paths = list()
+        self.events = list()
+
+    @property
+    def dsn(self) -> str:
+        return 'http://key@127.0.0.1:%d/1' % self.server_address[1]
+
+
+class SentryHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.paths.append(self.path)
+        if self.server.status == 200:
+            self.server.events.append(json.loads(body.decode('utf-8')))
+
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = SentryServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read_spool(path):
+    with open(str(path), mode='r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+#
+# Transport
+#
+
+def test_events_are_delivered(server, tmp_path):
+    spool = tmp_path / 'crashreports.spool'
+    transport = MglxSentryTransport(server.dsn, 'test/1.0', str(spool), interval=0.05, timeout=1)
+
+    for i in range(3):
+        transport({'event_id': i})
+
+    assert transport.flush(2)
+    assert [event['event_id'] for event in server.events] == [0, 1, 2]
+    assert set(server.paths) == {'/api/1/store/'}
+    assert transport.get_stats()['sent'] == 3
+    assert transport.get_stats()['spooled'] == 0
+    assert not spool.exists()
+
+    transport.kill()
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_unavailable_endpoint_spools_and_resends_after_recovery(server, tmp_path, status):
+    spool = tmp_path / 'crashreports.spool'
+    transport = MglxSentryTransport(server.dsn, 'test/1.0', str(spool), interval=0.05, timeout=1)
+
+    server.status = status
+    transport({'event_id': 1})
+    transport({'event_id': 2})
+
+    assert transport.flush(2)
+    assert transport.get_stats()['spooled'] == 2
+    assert transport.get_stats()['sent'] == 0
+    assert [event['event_id'] for event in read_spool(spool)] == [1, 2]
+
+    #worker retries the spool on its interval once the endpoint is back
+    server.status = 200
+    assert wait_for(lambda: transport.get_stats()['sent'] == 2)
+    assert [event['event_id'] for event in server.events] == [1, 2]
+    assert not spool.exists()
+
+    transport.kill()
+
+
+def test_rejected_event_is_dropped_not_spooled(server, tmp_path):
+    spool = tmp_path / 'crashreports.spool'
+    transport = MglxSentryTransport(server.dsn, 'test/1.0', str(spool), interval=0.05, timeout=1)
+
+    server.status = 400
+    transport({'event_id': 1})
+
+    assert transport.flush(2)
+    assert transport.get_stats()['dropped'] == 1
+    assert transport.get_stats()['spooled'] == 0
+    assert not spool.exists()
+
+    transport.kill()
+
+
+def test_flush_waits_for_queued_events(tmp_path):
+    spool = tmp_path / 'crashreports.spool'
+    transport = MglxSentryTransport(UNREACHABLE_DSN, 'test/1.0', str(spool), interval=5, timeout=1)
+
+    for i in range(10):
+        transport({'event_id': i})
+
+    assert transport.flush(2)
+    assert transport.get_stats()['spooled'] == 10
+    assert [event['event_id'] for event in read_spool(spool)] == list(range(10))
+
+    transport.kill()
+
+
+def test_kill_does_not_wait_for_worker_interval(tmp_path):
+    transport = MglxSentryTransport(UNREACHABLE_DSN, 'test/1.0', str(tmp_path / 'crashreports.spool'), interval=5, timeout=1)
+    transport({'event_id': 1})
+    assert transport.flush(2)
+
+    started = time.monotonic()
+    transport.kill(timeout=1.0)
+    assert time.monotonic() - started < 0.5
+
+
+def test_kill_spools_queued_events_and_drops_new_ones(tmp_path):
+    spool = tmp_path / 'crashreports.spool'
+    transport = MglxSentryTransport(UNREACHABLE_DSN, 'test/1.0', str(spool), interval=5, timeout=1)
+
+    for i in range(5):
+        transport({'event_id': i})
+    transport.kill(timeout=2.0)
+    transport({'event_id': 5})
+
+    assert sorted(event['event_id'] for event in read_spool(spool)) == list(range(5))
+    assert transport.get_stats()['dropped'] == 1
+    assert transport.flush(0.1)
+
+
+#
+# Filter
+#
+
+def create_event(message, logger='gw2_api'):
+    return {'logger': logger, 'level': 'error', 'logentry': {'message': message}}
+
+
+def test_filter_drops_identical_events_past_max_per_window():
+    event_filter = MglxSentryFilter(max_per_window=2)
+
+    passed = [event_filter(create_event('request: %s --> %s'), None) for _ in range(5)]
+
+    assert sum(event is not None for event in passed) == 2
+    assert event_filter.get_dropped() == 3
+
+    #events with another fingerprint have their own window
+    assert event_filter(create_event('shutdown: %s'), None) is not None
+    assert event_filter(create_event('request: %s --> %s', logger='mglx_http'), None) is not None
+
+
+def test_filter_window_expires():
+    event_filter = MglxSentryFilter(window=0.05, max_per_window=1)
+
+    assert event_filter(create_event('message'), None) is not None
+    assert event_filter(create_event('message'), None) is None
+
+    time.sleep(0.06)
+    assert event_filter(create_event('message'), None) is not None
+
+
+def test_filter_sampling():
+    assert all(MglxSentryFilter(sample_rate=0.0)(create_event('message %s' % i), None) is None for i in range(20))
+    assert all(MglxSentryFilter(sample_rate=1.0)(create_event('message %s' % i), None) is not None for i in range(20))
+
+    #get_dropped counts rate-limited events only
+    event_filter = MglxSentryFilter(sample_rate=0.0)
+    event_filter(create_event('message'), None)
+    assert event_filter.get_dropped() == 0
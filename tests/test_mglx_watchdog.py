@@ -0,0 +1,51 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import time
+
+import pytest
+
+from common.mglx_watchdog import MglxLoopWatchdog
+
+
+@pytest.mark.parametrize('threshold', [0, 0.05, -1, float('nan'), float('inf')])
+def test_invalid_threshold_is_rejected(threshold):
+    with pytest.raises(ValueError):
+        MglxLoopWatchdog(threshold)
+
+
+def test_stall_is_reported_once_with_stack():
+    async def session():
+        watchdog = MglxLoopWatchdog(0.1)
+        watchdog.start()
+        await asyncio.sleep(0.2)
+        time.sleep(0.3)
+        await asyncio.sleep(0.2)
+        await watchdog.shutdown()
+        return watchdog.get_stats(), watchdog.get_last_stack()
+
+    stats, stack = asyncio.run(session())
+
+    assert stats['stalls'] == 1
+    assert stats['stall_max'] >= 0.3
+    assert 'test_stall_is_reported_once_with_stack' in stack
+
+
+@pytest.mark.parametrize('value', ['0', '0.05', 'nan', 'inf', '-inf', 'abc'])
+def test_plugin_falls_back_to_default_threshold(plugin_module, monkeypatch, value):
+    from unittest import mock
+
+    monkeypatch.setenv('GW2_LOOP_WATCHDOG', '1')
+    monkeypatch.setenv('GW2_LOOP_WATCHDOG_THRESHOLD', value)
+
+    created = list()
+    monkeypatch.setattr(plugin_module.common.mglx_watchdog, 'MglxLoopWatchdog', type('Watchdog', (MglxLoopWatchdog,), {
+        '__init__': lambda self, threshold: created.append(threshold) or MglxLoopWatchdog.__init__(self, threshold)}))
+
+    async def session():
+        plugin = plugin_module.GuildWars2Plugin(mock.MagicMock(), mock.MagicMock(), 'token')
+        await plugin.shutdown()
+
+    asyncio.run(session())
+    assert created == [MglxLoopWatchdog.WATCHDOG_DEFAULT_THRESHOLD]
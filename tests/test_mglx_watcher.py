@@ -0,0 +1,110 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import os
+
+import pytest
+
+from common.mglx_executor import MglxExecutor
+from common.mglx_watcher import MglxInotifyBackend, MglxPollingBackend, MglxWatcher, MglxWatcherBackend
+
+requires_inotify = pytest.mark.skipif(not MglxInotifyBackend.is_supported(), reason='inotify is not available')
+
+
+async def wait_for(changes, path, timeout: float = 2):
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while path not in changes and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    return path in changes
+
+
+def test_backend_base_is_abstract():
+    with pytest.raises(TypeError):
+        MglxWatcherBackend([], lambda path: None)
+
+
+@requires_inotify
+def test_inotify_waits_for_missing_directory(tmp_path):
+    config_dir = str(tmp_path / 'AppData' / 'Guild Wars 2')
+    config_file = os.path.join(config_dir, 'GFXSettings.Gw2-64.exe.xml')
+
+    async def session():
+        changes = list()
+        backend = MglxInotifyBackend([config_dir], changes.append)
+        await backend.start()
+        try:
+            os.makedirs(config_dir)
+            created = await wait_for(changes, config_dir)
+
+            with open(config_file, 'w') as f:
+                f.write('<GSA_SDK/>')
+            written = await wait_for(changes, config_file)
+
+            return created, written
+        finally:
+            await backend.shutdown()
+
+    assert asyncio.run(session()) == (True, True)
+
+
+@requires_inotify
+def test_inotify_watches_directory_again_after_removal(tmp_path):
+    game_dir = str(tmp_path / 'Guild Wars 2')
+    os.makedirs(game_dir)
+
+    async def session():
+        changes = list()
+        backend = MglxInotifyBackend([game_dir], changes.append)
+        await backend.start()
+        try:
+            os.rmdir(game_dir)
+            removed = await wait_for(changes, game_dir)
+            changes.clear()
+
+            os.makedirs(game_dir)
+            created = await wait_for(changes, game_dir)
+            return removed, created
+        finally:
+            await backend.shutdown()
+
+    assert asyncio.run(session()) == (True, True)
+
+
+@requires_inotify
+def test_watcher_falls_back_to_polling_without_watchable_paths():
+    #unexpanded Windows path on Linux, neither it nor any of its ancestors exists
+    paths = ['%APPDATA%\\Guild Wars 2']
+
+    async def session():
+        watcher = MglxWatcher(lambda paths: None)
+        started = await watcher.start(paths)
+        name = watcher.get_backend_name()
+        await watcher.shutdown()
+        return started, name
+
+    assert asyncio.run(session()) == (True, MglxPollingBackend.name)
+
+
+def test_polling_uses_executor(tmp_path):
+    game_dir = str(tmp_path / 'Guild Wars 2')
+    os.makedirs(game_dir)
+
+    async def session():
+        changes = list()
+        executor = MglxExecutor(1, 1)
+        backend = MglxPollingBackend([game_dir], changes.append, executor, interval=0.05)
+        await backend.start()
+        try:
+            with open(os.path.join(game_dir, 'Gw2-64.exe'), 'w') as f:
+                f.write('exe')
+            created = await wait_for(changes, os.path.join(game_dir, 'Gw2-64.exe'))
+        finally:
+            await backend.shutdown()
+            await executor.shutdown()
+        return created, executor.get_stats()
+
+    created, stats = asyncio.run(session())
+    assert created
+    assert stats['jobs']['watcher_snapshot']['count'] >= 2
@@ -0,0 +1,99 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import json
+from unittest import mock
+
+from common.mglx_http_replay import MglxHttpRecorder, MglxHttpReplay
+from gw2.gw2_api import GW2API
+
+API_DOMAIN = 'https://api.guildwars2.com'
+ACCOUNT_URL = API_DOMAIN + '/v2/account'
+ACCOUNT_ACHIEVEMENTS_URL = API_DOMAIN + '/v2/account/achievements'
+
+
+class CountingReplay(MglxHttpReplay):
+    def __init__(self, path):
+        super().__init__(path)
+        self.urls = list()
+
+    async def request_json(self, method, url, **kwargs):
+        self.urls.append(url)
+        return await super().request_json(method, url, **kwargs)
+
+
+def create_fixture(path, achievements_responses=1):
+    recorder = MglxHttpRecorder(path)
+    account = {'id': 'account-id', 'name': 'Player.1234', 'age': 3600, 'access': ['GuildWars2']}
+    recorder.record('GET', ACCOUNT_URL, None, 200, {'ETag': '"1"'}, json.dumps(account), 0.1)
+
+    achievements = [{'id': 1, 'current': 1, 'max': 1, 'done': True}, {'id': 2, 'current': 0, 'max': 1, 'done': False}]
+    for _ in range(achievements_responses):
+        recorder.record('GET', ACCOUNT_ACHIEVEMENTS_URL, None, 200, {}, json.dumps(achievements), 0.1)
+
+
+async def create_plugin(plugin_module, replay):
+    plugin = plugin_module.GuildWars2Plugin(mock.MagicMock(), mock.MagicMock(), 'token')
+    plugin._gw2_api = GW2API('1.0', http=replay)
+    await plugin.authenticate({'api_key': 'api-key'})
+    return plugin
+
+
+def get_unlocked_ids(achievements):
+    return [achievement.achievement_id for achievement in achievements]
+
+
+def test_prepared_achievements_are_fetched_once(plugin_module, tmp_path):
+    path = str(tmp_path / 'fixture.json')
+    create_fixture(path)
+    replay = CountingReplay(path)
+
+    async def session():
+        plugin = await create_plugin(plugin_module, replay)
+        try:
+            context = await plugin.prepare_achievements_context([plugin.GAME_ID])
+            return [await plugin.get_unlocked_achievements(plugin.GAME_ID, context) for _ in range(3)]
+        finally:
+            await plugin.shutdown()
+
+    results = asyncio.run(session())
+
+    assert [get_unlocked_ids(result) for result in results] == [[1]] * 3
+    assert replay.urls.count(ACCOUNT_ACHIEVEMENTS_URL) == 1
+
+
+def test_achievements_are_fetched_without_context(plugin_module, tmp_path):
+    path = str(tmp_path / 'fixture.json')
+    create_fixture(path, achievements_responses=2)
+    replay = CountingReplay(path)
+
+    async def session():
+        plugin = await create_plugin(plugin_module, replay)
+        try:
+            return [await plugin.get_unlocked_achievements(plugin.GAME_ID, None) for _ in range(2)]
+        finally:
+            await plugin.shutdown()
+
+    results = asyncio.run(session())
+
+    assert [get_unlocked_ids(result) for result in results] == [[1]] * 2
+    assert replay.urls.count(ACCOUNT_ACHIEVEMENTS_URL) == 2
+
+
+def test_game_time_without_context_uses_account_info(plugin_module, tmp_path):
+    path = str(tmp_path / 'fixture.json')
+    create_fixture(path)
+    replay = CountingReplay(path)
+
+    async def session():
+        plugin = await create_plugin(plugin_module, replay)
+        try:
+            return await plugin.get_game_time(plugin.GAME_ID, None)
+        finally:
+            await plugin.shutdown()
+
+    game_time = asyncio.run(session())
+
+    assert game_time.time_played == 60
+    assert replay.urls == [ACCOUNT_URL]
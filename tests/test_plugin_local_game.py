@@ -0,0 +1,148 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import os
+from unittest import mock
+
+import pytest
+
+import common.mglx_watcher
+import gw2.gw2_localgame
+
+
+class FakeInstance(gw2.gw2_localgame.GWLocalGame):
+    def __init__(self, game_dir, size):
+        super().__init__(game_dir, 'gw2-64.exe')
+        self.size = size
+        self.scans = 0
+
+    def get_app_size(self, stop_event=None):
+        self.scans += 1
+        return self.size
+
+
+class FakeWatcher:
+    def __init__(self, callback, *args):
+        self.callback = callback
+        self.paths = list()
+
+    def is_started(self):
+        return True
+
+    async def set_paths(self, paths):
+        self.paths.append(sorted(paths))
+
+    async def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def game(tmp_path, monkeypatch):
+    game_dir = str(tmp_path / 'guild wars 2')
+    instance = FakeInstance(game_dir, 1024)
+
+    discoveries = list()
+    def get_game_instances(stop_event=None):
+        discoveries.append(game_dir)
+        return [instance]
+
+    watchers = list()
+    monkeypatch.setattr(gw2.gw2_localgame.platform, 'system', lambda: 'Windows')
+    monkeypatch.setattr(gw2.gw2_localgame, 'get_config_dir_windows', lambda: str(tmp_path / 'appdata') + os.sep)
+    monkeypatch.setattr(gw2.gw2_localgame, 'get_game_instances', get_game_instances)
+    monkeypatch.setattr(common.mglx_watcher, 'MglxWatcher', lambda *args: watchers.append(FakeWatcher(*args)) or watchers[-1])
+
+    return game_dir, instance, discoveries, watchers
+
+
+def create_plugin(plugin_module, instance):
+    plugin = plugin_module.GuildWars2Plugin(mock.MagicMock(), mock.MagicMock(), 'token')
+    plugin._game_instances = [instance] if instance is not None else []
+    return plugin
+
+
+def test_install_directory_write_resets_only_size(plugin_module, game):
+    game_dir, instance, discoveries, watchers = game
+
+    async def session():
+        plugin = create_plugin(plugin_module, instance)
+        try:
+            size_before = await plugin.get_local_size(plugin.GAME_ID, None)
+            await watchers[0].callback({os.path.join(game_dir, 'Gw2.dat')})
+
+            instance.size = 2048
+            size_after = await plugin.get_local_size(plugin.GAME_ID, None)
+            return size_before, size_after
+        finally:
+            await plugin.shutdown()
+
+    assert asyncio.run(session()) == (1024, 2048)
+    assert instance.scans == 2
+    assert discoveries == []
+    assert watchers[0].paths == []
+
+
+@pytest.mark.parametrize('name', ['', 'Gw2-64.exe'])
+def test_install_directory_or_executable_change_rediscovers_instances(plugin_module, game, name):
+    game_dir, instance, discoveries, watchers = game
+
+    async def session():
+        plugin = create_plugin(plugin_module, instance)
+        try:
+            await watchers[0].callback({os.path.join(game_dir, name) if name else game_dir})
+        finally:
+            await plugin.shutdown()
+
+    asyncio.run(session())
+    assert discoveries == [game_dir]
+    assert len(watchers[0].paths) == 1
+    assert os.path.normpath(game_dir) in watchers[0].paths[0]
+
+
+def test_prepared_local_size_is_scanned_once(plugin_module, game):
+    _, instance, _, _ = game
+
+    async def session():
+        plugin = create_plugin(plugin_module, instance)
+        try:
+            context = await plugin.prepare_local_size_context([plugin.GAME_ID])
+            return [await plugin.get_local_size(plugin.GAME_ID, context) for _ in range(3)]
+        finally:
+            await plugin.shutdown()
+
+    assert asyncio.run(session()) == [1024] * 3
+    assert instance.scans == 1
+
+
+def test_prepared_zero_local_size_is_returned(plugin_module, game):
+    _, instance, _, _ = game
+    instance.size = 0
+
+    async def session():
+        plugin = create_plugin(plugin_module, instance)
+        try:
+            context = await plugin.prepare_local_size_context([plugin.GAME_ID])
+            instance.size = 1024
+            return context, await plugin.get_local_size(plugin.GAME_ID, context)
+        finally:
+            await plugin.shutdown()
+
+    assert asyncio.run(session()) == (0, 0)
+    assert instance.scans == 1
+
+
+def test_local_size_without_context_or_instances(plugin_module, game):
+    _, instance, _, _ = game
+
+    async def session():
+        plugin = create_plugin(plugin_module, instance)
+        try:
+            size = await plugin.get_local_size(plugin.GAME_ID, None)
+            plugin._game_instances = []
+            return size, await plugin.prepare_local_size_context([plugin.GAME_ID]), await plugin.get_local_size(plugin.GAME_ID, None)
+        finally:
+            await plugin.shutdown()
+
+    assert asyncio.run(session()) == (1024, None, None)
+    assert instance.scans == 1
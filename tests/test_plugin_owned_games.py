@@ -0,0 +1,93 @@
+# (c) 2019-2020 Mikhail Paulyshka
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import json
+from unittest import mock
+
+from common.mglx_http_replay import MglxHttpRecorder, MglxHttpReplay
+from gw2.gw2_api import GW2API
+
+ACCOUNT_URL = 'https://api.guildwars2.com/v2/account'
+
+
+def create_fixture(path, *responses):
+    recorder = MglxHttpRecorder(path)
+    for status, access in responses:
+        body = json.dumps({'id': 'account-id', 'name': 'Player.1234', 'age': 3600, 'access': access}) if status == 200 else ''
+        recorder.record('GET', ACCOUNT_URL, None, status, {'ETag': '"%s"' % len(access or [])}, body, 0.1)
+
+
+async def create_plugin(plugin_module, path):
+    plugin = plugin_module.GuildWars2Plugin(mock.MagicMock(), mock.MagicMock(), 'token')
+    plugin._gw2_api = GW2API('1.0', http=MglxHttpReplay(path))
+    plugin.update_game = mock.Mock()
+    plugin.SLEEP_CHECK_ACCOUNT = 0
+
+    await plugin.authenticate({'api_key': 'api-key'})
+    return plugin
+
+
+def test_unchanged_access_does_not_update_game(plugin_module, tmp_path):
+    path = str(tmp_path / 'fixture.json')
+    create_fixture(path, (200, ['GuildWars2', 'HeartOfThorns']), (304, None), (200, ['GuildWars2', 'HeartOfThorns']))
+
+    async def session():
+        plugin = await create_plugin(plugin_module, path)
+        try:
+            games = await plugin.get_owned_games()
+            await plugin.task_check_for_account()
+            await plugin.task_check_for_account()
+            return plugin.update_game, games
+        finally:
+            await plugin.shutdown()
+
+    update_game, games = asyncio.run(session())
+
+    update_game.assert_not_called()
+    assert [dlc.dlc_title for dlc in games[0].dlcs] == ['Heart of Thorns']
+
+
+def test_changed_access_updates_game_once(plugin_module, tmp_path):
+    path = str(tmp_path / 'fixture.json')
+    create_fixture(path, (200, ['GuildWars2', 'HeartOfThorns']), (200, ['GuildWars2', 'HeartOfThorns', 'PathOfFire']), (304, None))
+
+    async def session():
+        plugin = await create_plugin(plugin_module, path)
+        try:
+            games_before = await plugin.get_owned_games()
+            await plugin.task_check_for_account()
+            await plugin.task_check_for_account()
+            games_after = await plugin.get_owned_games()
+            return plugin.update_game, games_before[0], games_after[0]
+        finally:
+            await plugin.shutdown()
+
+    update_game, game_before, game_after = asyncio.run(session())
+
+    update_game.assert_called_once()
+    game = update_game.call_args[0][0]
+    assert game is game_after
+    assert [dlc.dlc_title for dlc in game.dlcs] == ['Heart of Thorns', 'Path of Fire']
+
+    #memoized objects are reused
+    assert game_before is not game_after
+    assert game.dlcs[0] is game_before.dlcs[0]
+
+
+def test_owned_game_is_memoized(plugin_module, tmp_path):
+    path = str(tmp_path / 'fixture.json')
+    create_fixture(path, (200, ['PlayForFree', 'GuildWars2', 'EndOfDragons']))
+
+    async def session():
+        plugin = await create_plugin(plugin_module, path)
+        try:
+            return await plugin.get_owned_games(), await plugin.get_owned_games()
+        finally:
+            await plugin.shutdown()
+
+    first, second = asyncio.run(session())
+
+    assert first[0] is second[0]
+    assert first[0].license_info.license_type.name == 'FreeToPlay'
+    assert [dlc.dlc_title for dlc in first[0].dlcs] == ['End of Dragons']